@@ -0,0 +1,68 @@
+"""
+Synthetic multilingual corpora for the stories.bin benchmarks
+"""
+
+import random
+from typing import List, Tuple
+
+LANGUAGES = ["en", "zh-Hans", "zh-Hant", "ja", "ko", "fr", "de", "es"]
+# How text_ids are spelled: zero padded counters, or random ids whose sort order has no relation to creation
+KEY_LAYOUTS = ("sequential", "random")
+
+# Per language alphabets the synthetic words are drawn from
+ALPHABETS = {
+    "en": "abcdefghijklmnopqrstuvwxyz",
+    "fr": "abcdefghijklmnopqrstuvwxyzéèàç",
+    "de": "abcdefghijklmnopqrstuvwxyzäöüß",
+    "es": "abcdefghijklmnopqrstuvwxyzñá",
+    "zh-Hans": "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经",
+    "zh-Hant": "的一是在不了有和人這中大為上個國我以要他時來用們生到作地於出就分對成會可主發年動同工也能下過子說產種面而方後多定行學法所民得經",
+    "ja": "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん",
+    "ko": "가나다라마바사아자차카타파하거너더러머버서어저처커터퍼허고노도로모보소오조초코토포호",
+}
+
+
+def _vocabulary(language: str, size: int, rng: random.Random) -> List[str]:
+    alphabet = ALPHABETS.get(language, ALPHABETS["en"])
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(2, 8))) for _ in range(size)]
+
+
+def generate_corpus(
+    num_records: int,
+    languages: List[str] = LANGUAGES,
+    words_per_text: Tuple[int, int] = (8, 40),
+    vocabulary_size: int = 5000,
+    seed: int = 0,
+    key_layout: str = "sequential",
+    coverage: float = 1.0,
+) -> List[Tuple[str, str, str, str]]:
+    """
+    Generate (language, text_id, source, content) records
+    
+    By default every text_id exists in every language, like translated stories, so
+    num_records is rounded down to a multiple of the number of languages. With coverage
+    below 1 each text_id keeps that share of its languages, at least one, so fewer
+    records are generated. Word frequencies follow a Zipf-like distribution like natural text.
+    """
+    if key_layout not in KEY_LAYOUTS:
+        raise ValueError(f"key_layout must be one of {KEY_LAYOUTS}")
+    rng = random.Random(seed)
+    # Separate streams, so the default corpus does not change with the extra options
+    key_rng = random.Random(seed + 1)
+    vocabularies = {language: _vocabulary(language, vocabulary_size, rng) for language in languages}
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    separator = {language: "" if language in ("zh-Hans", "zh-Hant", "ja") else " " for language in languages}
+
+    texts = []
+    num_text_ids = max(1, num_records // len(languages))
+    for i in range(num_text_ids):
+        text_id = f"t{i:08d}" if key_layout == "sequential" else f"r{key_rng.getrandbits(60):015x}"
+        source = "TEXT" if i % 2 == 0 else "AUDIO"
+        text_languages = languages
+        if coverage < 1:
+            text_languages = [language for language in languages if key_rng.random() < coverage] or [
+                key_rng.choice(languages)]
+        for language in text_languages:
+            words = rng.choices(vocabularies[language], weights=weights, k=rng.randint(*words_per_text))
+            texts.append((language, text_id, source, separator[language].join(words)))
+    return texts
@@ -0,0 +1,82 @@
+"""
+Measure phrase search latency against corpus size, with and without the trigram index
+
+Usage:
+    python -m benchmarks.search_benchmark --sizes 1000 10000 100000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+from benchmarks.corpus import generate_corpus
+from generate_file import generate_binary_file, generate_trigram_index
+from src.services.file_decoding_service import FileDecodingService
+
+
+def _queries(texts, count: int, rng: random.Random) -> List[str]:
+    """Phrases cut from random texts, so every query has at least one match"""
+    queries = []
+    while len(queries) < count:
+        content = rng.choice(texts)[3]
+        if len(content) < 8:
+            continue
+        start = rng.randint(0, len(content) - 8)
+        queries.append(content[start:start + rng.randint(4, 8)])
+    return queries
+
+
+def _measure(reader: FileDecodingService, queries: List[str], limit: int) -> List[float]:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        reader.search(query, limit=limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure phrase search latency")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000], help="Corpus sizes in records")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus size")
+    parser.add_argument("--limit", type=int, default=20, help="Result limit per query")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'records':>10}{'index MB':>10}{'build s':>9}{'scan p50':>10}{'scan p95':>10}{'index p50':>11}{'index p95':>11}  (ms)")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            base_file = os.path.join(workdir, f"stories_{size}.bin")
+            texts = generate_corpus(size)
+            generate_binary_file(texts, base_file)
+            queries = _queries(texts, args.queries, rng)
+
+            reader = FileDecodingService(base_file)
+            scan = _measure(reader, queries, args.limit)
+            reader.close()
+
+            start = time.perf_counter()
+            generate_trigram_index(base_file)
+            build_seconds = time.perf_counter() - start
+            index_mb = os.path.getsize(f"{base_file}.tri") / (1024 * 1024)
+
+            reader = FileDecodingService(base_file)
+            indexed = _measure(reader, queries, args.limit)
+            reader.close()
+
+            print(f"{len(texts):>10}{index_mb:>10.2f}{build_seconds:>9.2f}"
+                  f"{statistics.median(scan):>10.2f}{_percentile(scan, 95):>10.2f}"
+                  f"{statistics.median(indexed):>11.2f}{_percentile(indexed, 95):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
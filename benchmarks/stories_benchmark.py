@@ -0,0 +1,242 @@
+"""
+Measure stories.bin generation and lookup against corpus size
+
+For every corpus size the file is built in a child process, recording build time, the
+peak memory the build adds on top of the corpus and the file size. FileDecodingService.get_text
+is then timed for random, Zipf-skewed and sequential keys, in one process and across
+several processes sharing the page cache.
+
+The JSON report holds the environment and the commit it ran on, --compare prints the
+change against an earlier report.
+
+Usage:
+    python -m benchmarks.stories_benchmark --sizes 1000 100000 10000000 --output bench.json
+    python -m benchmarks.stories_benchmark --sizes 1000 100000 --compare bench.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.corpus import KEY_LAYOUTS, LANGUAGES, generate_corpus
+from generate_file import generate_binary_file
+from src.services.file_decoding_service import FileDecodingService
+
+ACCESS_PATTERNS = ("random", "zipf", "sequential")
+# Metrics where a lower value is better, every other compared metric is a throughput
+LOWER_IS_BETTER = ("build_seconds", "build_peak_mb", "file_mb", "p50_us", "p95_us", "p99_us", "max_us")
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def _build(size: int, path: str, key_layout: str, coverage: float, words: Tuple[int, int],
+           results: "multiprocessing.Queue") -> None:
+    """Child process: generate the corpus, then build the file from it"""
+    texts = generate_corpus(size, words_per_text=words, key_layout=key_layout, coverage=coverage)
+    before = _max_rss_mb()
+    start = time.perf_counter()
+    generate_binary_file(texts, path)
+    seconds = time.perf_counter() - start
+    results.put({"records": len(texts), "build_seconds": seconds, "build_peak_mb": _max_rss_mb() - before})
+
+
+def build_file(size: int, path: str, key_layout: str, coverage: float, words: Tuple[int, int]) -> Dict[str, Any]:
+    """Build a stories file in a fresh process, so the peak memory of earlier sizes does not hide it"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_build, args=(size, path, key_layout, coverage, words, results))
+    process.start()
+    result = results.get()
+    process.join()
+    file_bytes = os.path.getsize(path)
+    result["file_mb"] = file_bytes / (1024 * 1024)
+    result["bytes_per_record"] = file_bytes / result["records"]
+    result["build_records_per_second"] = result["records"] / result["build_seconds"]
+    return result
+
+
+def sample_positions(pattern: str, num_records: int, count: int, zipf_exponent: float,
+                     rng: np.random.Generator) -> np.ndarray:
+    """Index record positions to look up, in lookup order"""
+    if pattern == "random":
+        return rng.integers(0, num_records, size=count)
+    if pattern == "sequential":
+        start = int(rng.integers(0, num_records))
+        return (start + np.arange(count)) % num_records
+    # Zipf ranks, drawn again when past the corpus
+    ranks = rng.zipf(zipf_exponent, size=count)
+    while (ranks > num_records).any():
+        over = ranks > num_records
+        ranks[over] = rng.zipf(zipf_exponent, size=int(over.sum()))
+    # Spread hot keys over the file with a bijective hash, rank 1 is not the first record
+    multiplier = 2654435761
+    while math.gcd(multiplier, num_records) != 1:
+        multiplier += 2
+    return ((ranks - 1) * multiplier) % num_records
+
+
+def _lookup(path: str, keys: List[Tuple[str, str]]) -> List[float]:
+    """Time get_text for each key, in microseconds"""
+    # Every hit is logged at INFO, which would dominate the timings
+    logging.disable(logging.INFO)
+    reader = FileDecodingService(path)
+    timings = []
+    try:
+        for language, text_id in keys:
+            start = time.perf_counter()
+            reader.get_text(language, text_id)
+            timings.append((time.perf_counter() - start) * 1e6)
+    finally:
+        reader.close()
+    return timings
+
+
+def measure_lookups(path: str, keys: List[Tuple[str, str]], processes: int) -> Dict[str, float]:
+    """Latency percentiles and throughput of looking up keys, split across processes"""
+    if processes == 1:
+        start = time.perf_counter()
+        timings = _lookup(path, keys)
+        seconds = time.perf_counter() - start
+    else:
+        # Contiguous slices, so each process keeps the order of a sequential pattern
+        step = math.ceil(len(keys) / processes)
+        chunks = [keys[i:i + step] for i in range(0, len(keys), step)]
+        with multiprocessing.Pool(len(chunks)) as pool:
+            # Open the readers before the clock starts
+            pool.starmap(_lookup, [(path, chunk[:10]) for chunk in chunks])
+            start = time.perf_counter()
+            timings = [timing for chunk in pool.starmap(_lookup, [(path, chunk) for chunk in chunks])
+                       for timing in chunk]
+            seconds = time.perf_counter() - start
+
+    timings = np.array(timings)
+    return {
+        "p50_us": float(np.percentile(timings, 50)),
+        "p95_us": float(np.percentile(timings, 95)),
+        "p99_us": float(np.percentile(timings, 99)),
+        "max_us": float(timings.max()),
+        "lookups_per_second": len(timings) / seconds,
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for size in args.sizes:
+            path = os.path.join(workdir, f"stories_{size}.bin")
+            result = {"size": size, **build_file(size, path, args.key_layout, args.coverage, tuple(args.words))}
+            print(f"built {result['records']} records in {result['build_seconds']:.2f}s, "
+                  f"{result['file_mb']:.1f} MB, +{result['build_peak_mb']:.1f} MB peak", file=sys.stderr)
+
+            reader = FileDecodingService(path)
+            rng = np.random.default_rng(args.seed)
+            result["lookups"] = {}
+            for pattern in args.patterns:
+                positions = sample_positions(pattern, reader.num_records, args.lookups, args.zipf_exponent, rng)
+                keys = [reader._read_record(int(position))[:2] for position in positions]
+                for processes in args.processes:
+                    result["lookups"][f"{pattern}/{processes}p"] = measure_lookups(path, keys, processes)
+            reader.close()
+            results.append(result)
+            os.unlink(path)
+    return {"environment": _environment(), "config": vars(args), "results": results}
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _flatten(report: Dict[str, Any]) -> Dict[Tuple[int, str], float]:
+    """(size, metric) -> value, lookup metrics are named pattern/processes/metric"""
+    values = {}
+    for result in report["results"]:
+        for metric in ("build_seconds", "build_records_per_second", "build_peak_mb", "file_mb"):
+            values[(result["size"], metric)] = result[metric]
+        for run_name, lookups in result["lookups"].items():
+            for metric, value in lookups.items():
+                values[(result["size"], f"{run_name}/{metric}")] = value
+    return values
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    environment = report["environment"]
+    print(f"commit={environment['commit']} python={environment['python']} cpus={environment['cpus']}")
+    if baseline is not None:
+        print(f"baseline commit={baseline['environment']['commit']}")
+    old = _flatten(baseline) if baseline is not None else {}
+    print(f"{'size':>10}  {'metric':<36}{'value':>14}{'baseline':>14}{'better':>9}")
+    for (size, metric), value in _flatten(report).items():
+        line = f"{size:>10}  {metric:<36}{value:>14.2f}"
+        if (size, metric) in old and old[(size, metric)]:
+            previous = old[(size, metric)]
+            change = (value - previous) / previous * 100
+            # Positive is always an improvement, for latencies and sizes too
+            if metric.endswith(LOWER_IS_BETTER):
+                change = -change
+            line += f"{previous:>14.2f}{change:>+8.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure stories.bin generation and lookup")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000, 1000000],
+                        help="Corpus sizes in records")
+    parser.add_argument("--key-layout", choices=KEY_LAYOUTS, default="sequential", help="How text_ids are spelled")
+    parser.add_argument("--coverage", type=float, default=1.0,
+                        help=f"Share of the {len(LANGUAGES)} languages each text_id exists in")
+    parser.add_argument("--words", nargs=2, type=int, default=[8, 40], metavar=("MIN", "MAX"),
+                        help="Words per text")
+    parser.add_argument("--patterns", nargs="+", choices=ACCESS_PATTERNS, default=list(ACCESS_PATTERNS))
+    parser.add_argument("--lookups", type=int, default=20000, help="Lookups per pattern")
+    parser.add_argument("--zipf-exponent", type=float, default=1.1, help="Skew of the zipf pattern")
+    parser.add_argument("--processes", nargs="+", type=int, default=[1, os.cpu_count() or 1],
+                        help="Reader process counts to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="Directory of the generated files, default the system temp dir")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+    args.processes = sorted(set(args.processes))
+
+    # generate_binary_file logs every step
+    logging.disable(logging.INFO)
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare one-at-a-time and batched transcription throughput
+
+Clips longer than 30 seconds are cut to their first 30 seconds so every clip fits
+one decoding window.
+
+Usage:
+    python -m benchmarks.stt_batch_benchmark --clips resources/1.mp3 --copies 16 --batch-sizes 1 4 8 16
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+
+
+def _prepare_clips(clips: List[str], copies: int, workdir: str) -> List[str]:
+    """Write the first 30 seconds of every clip as wav, repeated to reach the requested count"""
+    import numpy as np
+    import whisper
+    import wave
+
+    prepared = []
+    for i, clip in enumerate(clips):
+        audio = whisper.load_audio(clip)[:SAMPLE_RATE * WINDOW_SECONDS]
+        path = os.path.join(workdir, f"clip_{i}.wav")
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+        prepared.append(path)
+    return [prepared[i % len(prepared)] for i in range(max(copies, len(prepared)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batched transcription throughput")
+    parser.add_argument("--clips", nargs="+", default=["resources/1.mp3"], help="Audio clips to transcribe")
+    parser.add_argument("--copies", type=int, default=16, help="Number of transcription jobs")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8, 16], help="Batch sizes to compare")
+    args = parser.parse_args()
+
+    from src.services.stt_service import get_stt_backend
+
+    backend = get_stt_backend()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        jobs = _prepare_clips(args.clips, args.copies, workdir)
+        # Warm up
+        backend.transcribe(jobs[0])
+
+        print(f"backend={backend.name} jobs={len(jobs)}")
+        print(f"{'batch size':>10}{'seconds':>10}{'clips/s':>10}{'speedup':>10}")
+        baseline = None
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            if batch_size == 1:
+                # One-at-a-time path used by stt_task without batching
+                for job in jobs:
+                    backend.transcribe(job)
+            else:
+                for i in range(0, len(jobs), batch_size):
+                    backend.transcribe_batch(jobs[i:i + batch_size])
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{batch_size:>10}{elapsed:>10.2f}{len(jobs) / elapsed:>10.2f}{baseline / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare real-time factor and memory of the STT backends
+
+Usage:
+    python -m benchmarks.stt_benchmark --audio resources/1.mp3 --backends whisper faster_whisper
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from typing import Any, Dict, List
+
+SAMPLE_RATE = 16000
+
+
+def _audio_duration(audio: str) -> float:
+    """Decode the audio with ffmpeg the way whisper does and return its duration in seconds"""
+    import whisper
+
+    return len(whisper.load_audio(audio)) / SAMPLE_RATE
+
+
+def _run_backend(name: str, audio: str, repeat: int, queue: multiprocessing.Queue) -> None:
+    """Measure one backend, runs in its own process so peak memory is not shared"""
+    from src.services.stt_service import create_stt_backend
+
+    try:
+        start = time.perf_counter()
+        backend = create_stt_backend(name)
+        load_seconds = time.perf_counter() - start
+
+        # Warm up, first call pays for lazy initialization
+        result = backend.transcribe(audio)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = backend.transcribe(audio)
+            timings.append(time.perf_counter() - start)
+
+        # ru_maxrss is reported in KB on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+        queue.put({
+            "backend": name,
+            "load_seconds": load_seconds,
+            "transcribe_seconds": min(timings),
+            "peak_rss_mb": peak_mb,
+            "language": result["language"],
+            "text": result["text"],
+        })
+    except Exception as e:
+        queue.put({"backend": name, "error": str(e)})
+
+
+def run(audio: str, backends: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """Run every backend in a fresh process and collect the measurements"""
+    duration = _audio_duration(audio)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in backends:
+        queue = context.Queue()
+        process = context.Process(target=_run_backend, args=(name, audio, repeat, queue))
+        process.start()
+        measurement = queue.get()
+        process.join()
+        measurement["audio_seconds"] = duration
+        if "transcribe_seconds" in measurement:
+            measurement["rtf"] = measurement["transcribe_seconds"] / duration
+        results.append(measurement)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare STT backends on one audio file")
+    parser.add_argument("--audio", default="resources/1.mp3", help="Audio file to transcribe")
+    parser.add_argument("--backends", nargs="+", default=["whisper", "faster_whisper"], help="Backends to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per backend, the best one is reported")
+    args = parser.parse_args()
+
+    results = run(args.audio, args.backends, args.repeat)
+
+    print(f"{'backend':<16}{'load s':>10}{'transcribe s':>14}{'RTF':>8}{'peak RSS MB':>14}  language")
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<16}  failed: {r['error']}")
+            continue
+        print(f"{r['backend']:<16}{r['load_seconds']:>10.2f}{r['transcribe_seconds']:>14.2f}"
+              f"{r['rtf']:>8.3f}{r['peak_rss_mb']:>14.1f}  {r['language']}")
+    for r in results:
+        if "text" in r:
+            print(f"\n[{r['backend']}] {r['text'].strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 -- Create extension for UUID generation if not exists
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
--- Create translation_tasks table
+-- Create translation_tasks table, range partitioned by created_at (one partition per month)
 CREATE TABLE translation_tasks (
-    -- Primary key
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    -- Primary key (partition key must be part of every unique constraint)
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     
     -- Task identification
-    task_id VARCHAR(255) UNIQUE NOT NULL,
+    task_id VARCHAR(255) NOT NULL,
     
     -- Input data
     audio_url TEXT NOT NULL,
@@ -22,15 +22,52 @@ CREATE TABLE translation_tasks (
     -- Processing results
     stt_result JSONB,
     translation_results JSONB,
+    -- Stage state used to resume retries
+    checkpoint JSONB,
+
+    -- Lease of the worker processing the task
+    lease_owner VARCHAR(255),
+    lease_expires_at TIMESTAMPTZ,
     
     -- Error handling
-    error_message TEXT
-);
+    error_message TEXT,
+
+    PRIMARY KEY (id, created_at),
+    UNIQUE (task_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Create indexes for better query performance (created on every partition)
+-- Status filtered listings, in (created_at, id) keyset order so pages need no extra sort.
+-- Split by status: a row is in exactly one of the two partial indexes, and hot queries on
+-- live tasks only scan the small live one. The finished one backs listings of finished tasks.
+CREATE INDEX idx_translation_tasks_live ON translation_tasks(status, created_at, id)
+    WHERE status IN ('pending', 'processing');
+CREATE INDEX idx_translation_tasks_finished ON translation_tasks(status, created_at, id)
+    WHERE status IN ('completed', 'failed', 'cancelled');
+
+-- Create monthly partition containing the given date, returns the partition name
+CREATE OR REPLACE FUNCTION create_translation_tasks_partition(month_start DATE)
+RETURNS TEXT AS $$
+DECLARE
+    partition_start DATE := date_trunc('month', month_start)::DATE;
+    partition_end DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := 'translation_tasks_p' || to_char(partition_start, 'YYYYMM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF translation_tasks FOR VALUES FROM (%L) TO (%L)',
+        partition_name, partition_start, partition_end
+    );
+    RETURN partition_name;
+END;
+$$ language 'plpgsql';
+
+-- Create partitions for the current and the next two months,
+-- the maintenance task keeps creating partitions ahead of time
+SELECT create_translation_tasks_partition((date_trunc('month', NOW()) + make_interval(months => m))::DATE)
+FROM generate_series(0, 2) AS m;
 
--- Create indexes for better query performance
-CREATE INDEX idx_translation_tasks_id ON translation_tasks(id);
-CREATE INDEX idx_translation_tasks_task_id ON translation_tasks(task_id);
-CREATE INDEX idx_translation_tasks_status ON translation_tasks(status);
+-- Catch rows outside of any monthly partition
+CREATE TABLE translation_tasks_default PARTITION OF translation_tasks DEFAULT;
 
 -- Create trigger for automatic updated_at timestamp update
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -41,9 +78,30 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Lease heartbeats only move lease_expires_at, they are not updates of the task
 CREATE TRIGGER update_translation_tasks_updated_at
     BEFORE UPDATE ON translation_tasks
     FOR EACH ROW
+    WHEN ((to_jsonb(OLD) - 'lease_expires_at') IS DISTINCT FROM (to_jsonb(NEW) - 'lease_expires_at'))
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Create translation_task_submissions table, maps a submission fingerprint to the task serving it.
+-- Not partitioned so the fingerprint stays globally unique.
+CREATE TABLE translation_task_submissions (
+    fingerprint VARCHAR(64) PRIMARY KEY,
+    payload_fingerprint VARCHAR(64) NOT NULL,
+    idempotency_key VARCHAR(255),
+    task_id VARCHAR(255) NOT NULL,
+    duplicate_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_translation_task_submissions_created_at ON translation_task_submissions(created_at);
+
+CREATE TRIGGER update_translation_task_submissions_updated_at
+    BEFORE UPDATE ON translation_task_submissions
+    FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
 -- Add comments for documentation
@@ -54,8 +112,18 @@ COMMENT ON COLUMN translation_tasks.audio_url IS 'URL of the audio file to be pr
 COMMENT ON COLUMN translation_tasks.original_text IS 'Original text from speech-to-text';
 COMMENT ON COLUMN translation_tasks.target_languages IS 'Array of target language codes';
 COMMENT ON COLUMN translation_tasks.status IS 'Task processing status';
-COMMENT ON COLUMN translation_tasks.created_at IS 'Task creation timestamp';
+COMMENT ON COLUMN translation_tasks.created_at IS 'Task creation timestamp, partition key';
 COMMENT ON COLUMN translation_tasks.updated_at IS 'Last update timestamp';
 COMMENT ON COLUMN translation_tasks.stt_result IS 'Speech-to-text result with metadata';
 COMMENT ON COLUMN translation_tasks.translation_results IS 'Translation results for each target language';
-COMMENT ON COLUMN translation_tasks.error_message IS 'Error message if task failed';
\ No newline at end of file
+COMMENT ON COLUMN translation_tasks.checkpoint IS 'Downloaded audio reference and retry attempts per stage, retries resume from the first incomplete stage';
+COMMENT ON COLUMN translation_tasks.lease_owner IS 'host:pid of the worker processing the task';
+COMMENT ON COLUMN translation_tasks.lease_expires_at IS 'Processing tasks past this time lost their worker and are re-queued by the lease reaper';
+COMMENT ON COLUMN translation_tasks.error_message IS 'Error message if task failed';
+
+COMMENT ON TABLE translation_task_submissions IS 'Deduplication ledger of translation task submissions';
+COMMENT ON COLUMN translation_task_submissions.fingerprint IS 'Hash of the idempotency key if given, otherwise of the request payload';
+COMMENT ON COLUMN translation_task_submissions.payload_fingerprint IS 'Hash of audio_url, target_languages and original_text';
+COMMENT ON COLUMN translation_task_submissions.idempotency_key IS 'Client supplied idempotency key';
+COMMENT ON COLUMN translation_task_submissions.task_id IS 'Task serving this submission';
+COMMENT ON COLUMN translation_task_submissions.duplicate_count IS 'Number of submissions attached to the task after the first one';
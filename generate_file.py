@@ -1,8 +1,31 @@
+import argparse
+import os
 import struct
 import logging
-from typing import List, Tuple, Dict
+from typing import Iterable, List, Tuple, Dict
 from collections import defaultdict
 
+from src.services.delta_segment import OP_DELETE, OP_PUT, DeltaSegment, delta_path, encode_delta_record
+from src.services.file_decoding_service import FileDecodingService
+from src.services.trigram_index import trigram_index_path, write_trigram_index
+
+def validate_record(language: str, text_id: str, source: str) -> None:
+    """
+    Check that a record fits the fixed size index fields.
+    """
+    if len(language.encode('utf-8')) > 8:
+        logging.error(f"language code {language} is too long")
+        raise ValueError(f"language code {language} is too long")
+    if len(text_id.encode('utf-8')) > 16:
+        logging.error(f"text id {text_id} is too long")
+        raise ValueError(f"text id {text_id} is too long")
+    if len(source.encode('utf-8')) > 5:
+        logging.error(f"source {source} is too long")
+        raise ValueError(f"source {source} is too long")
+    if source not in ["TEXT", "AUDIO"]:
+        logging.error(f"invalid source {source}")
+        raise ValueError(f"source {source} must be TEXT or AUDIO")
+
 def generate_binary_file(
     texts: List[Tuple[str, str, str, str]],
     output_file: str = "stories.bin"
@@ -25,18 +48,7 @@ def generate_binary_file(
         # 3. build data and index records
         for language, text_id, source, content in texts:
             # validate input
-            if len(language.encode('utf-8')) > 8:
-                logging.error(f"language code {language} is too long")
-                raise ValueError(f"language code {language} is too long")
-            if len(text_id.encode('utf-8')) > 16:
-                logging.error(f"text id {text_id} is too long")
-                raise ValueError(f"text id {text_id} is too long")
-            if len(source.encode('utf-8')) > 5:
-                logging.error(f"source {source} is too long")
-                raise ValueError(f"source {source} is too long")
-            if source not in ["TEXT", "AUDIO"]:
-                logging.error(f"invalid source {source}")
-                raise ValueError(f"source {source} must be TEXT or AUDIO")
+            validate_record(language, text_id, source)
 
             # encode text content to UTF-8
             content_bytes = content.encode('utf-8')
@@ -86,8 +98,95 @@ def generate_binary_file(
         logging.error(f"failed to generate binary file: {str(e)}")
         raise
 
-if __name__ == "__main__":
-    
+def append_delta_records(
+    base_file: str,
+    texts: Iterable[Tuple[str, str, str, str]] = (),
+    deletes: Iterable[Tuple[str, str]] = ()
+) -> None:
+    """
+    Append new or updated texts and deletions to the delta segment of a base file.
+    """
+    payload = bytearray()
+    for language, text_id, source, content in texts:
+        validate_record(language, text_id, source)
+        payload.extend(encode_delta_record(OP_PUT, language, text_id, source, content))
+    for language, text_id in deletes:
+        validate_record(language, text_id, "TEXT")
+        payload.extend(encode_delta_record(OP_DELETE, language, text_id))
+
+    # One write so readers never see part of a batch, a torn tail is ignored by readers
+    with open(delta_path(base_file), 'ab') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    logging.info(f"appended {len(payload)} bytes to {delta_path(base_file)}")
+
+
+def compact_binary_file(base_file: str = "stories.bin") -> None:
+    """
+    Merge the delta segment of a base file into a new base file, offline.
+    """
+    delta_file = delta_path(base_file)
+    reader = FileDecodingService(base_file)
+    try:
+        if reader.delta is None:
+            logging.info(f"no delta segment for {base_file}, nothing to compact")
+            return
+        consumed = reader.delta.size
+        texts = [
+            (record['language'], record['text_id'], record['source'], record['content'])
+            for language in reader.languages()
+            for record in reader.iter_language(language)
+        ]
+    finally:
+        reader.close()
+
+    # Swap in the new base first, readers seeing it with the old delta get the same answers
+    temp_file = f"{base_file}.compact"
+    generate_binary_file(texts, temp_file)
+    os.replace(temp_file, base_file)
+    # Record positions moved, an existing index must follow the new base
+    if os.path.exists(trigram_index_path(base_file)):
+        generate_trigram_index(base_file)
+
+    # Keep complete records appended while compacting, drop a torn tail so later appends stay readable
+    with open(delta_file, 'rb') as f:
+        f.seek(consumed)
+        tail = f.read()
+    if tail:
+        with open(f"{delta_file}.compact", 'wb') as f:
+            f.write(tail)
+        tail_segment = DeltaSegment(f"{delta_file}.compact")
+        complete = tail_segment.size
+        tail_segment.close()
+        tail = tail[:complete]
+    if tail:
+        os.truncate(f"{delta_file}.compact", len(tail))
+        os.replace(f"{delta_file}.compact", delta_file)
+    else:
+        if os.path.exists(f"{delta_file}.compact"):
+            os.unlink(f"{delta_file}.compact")
+        os.unlink(delta_file)
+    logging.info(f"compacted {base_file}: {len(texts)} records, {len(tail)} delta bytes kept")
+
+
+def generate_trigram_index(base_file: str = "stories.bin") -> None:
+    """
+    Generate the trigram index sidecar of a base file for phrase search.
+    """
+    reader = FileDecodingService(base_file)
+    try:
+        num_trigrams = write_trigram_index(
+            reader.iter_base_contents(), reader.num_records, reader.fingerprint(), trigram_index_path(base_file))
+    finally:
+        reader.close()
+    logging.info(f"trigram index {trigram_index_path(base_file)} generated: {num_trigrams} trigrams")
+
+
+def generate_sample_file(output_file: str = "stories.bin") -> None:
+    """
+    Generate the sample stories file.
+    """
     sample_texts = [
         ("en", "0", "TEXT", "Hello, world!"),
         ("en", "1", "AUDIO", "This is a test."),
@@ -99,7 +198,46 @@ if __name__ == "__main__":
         ("ja", "7", "AUDIO", "これはテストです。"),
     ]
 
+    generate_binary_file(sample_texts, output_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate and maintain stories binary files")
+    subparsers = parser.add_subparsers(dest="command")
+
+    sample_parser = subparsers.add_parser("sample", help="generate the sample file (default)")
+    sample_parser.add_argument("--output", default="stories.bin")
+
+    append_parser = subparsers.add_parser("append", help="add or update a text in the delta segment")
+    append_parser.add_argument("base_file")
+    append_parser.add_argument("language")
+    append_parser.add_argument("text_id")
+    append_parser.add_argument("source", choices=["TEXT", "AUDIO"])
+    append_parser.add_argument("content")
+
+    delete_parser = subparsers.add_parser("delete", help="delete a text through the delta segment")
+    delete_parser.add_argument("base_file")
+    delete_parser.add_argument("language")
+    delete_parser.add_argument("text_id")
+
+    index_parser = subparsers.add_parser("index", help="generate the trigram search index of a base file")
+    index_parser.add_argument("base_file", nargs="?", default="stories.bin")
+
+    compact_parser = subparsers.add_parser("compact", help="merge the delta segment into a new base file")
+    compact_parser.add_argument("base_file", nargs="?", default="stories.bin")
+
+    args = parser.parse_args()
+
     try:
-        generate_binary_file(sample_texts, "stories.bin")
+        if args.command == "append":
+            append_delta_records(args.base_file, texts=[(args.language, args.text_id, args.source, args.content)])
+        elif args.command == "delete":
+            append_delta_records(args.base_file, deletes=[(args.language, args.text_id)])
+        elif args.command == "index":
+            generate_trigram_index(args.base_file)
+        elif args.command == "compact":
+            compact_binary_file(args.base_file)
+        else:
+            generate_sample_file(getattr(args, "output", "stories.bin"))
     except Exception as e:
         logging.error(f"script failed: {str(e)}")
\ No newline at end of file
@@ -3,10 +3,13 @@ FastAPI application module for Multi Translate Service
 """
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from src.routes.translation import router as translation_router
 from src.models.base import engine
+from src.services.story_store import get_story_store
 from src.utils.logger import get_logger
+from src.utils.profiling import ProfilingMiddleware, profiling_enabled
 
 # Get logger for this module
 logger = get_logger(__name__)
@@ -18,11 +21,14 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     logger.info("Starting application...")
+    # Map the stories shards and watch for new versions
+    get_story_store().start_watching()
     
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    get_story_store().stop_watching()
     # Close database connection pool
     await engine.dispose()
     logger.info("Application shutdown completed")
@@ -35,9 +41,14 @@ def create_app() -> FastAPI:
         title="Multi Translate Service",
         description="Multi Translate Service API",
         version="0.1.0",
-        lifespan=lifespan
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse
     )
     
+    if profiling_enabled():
+        app.add_middleware(ProfilingMiddleware)
+        logger.info("Request profiling enabled")
+    
     # Register routes
     app.include_router(translation_router, tags=["translation"])
     logger.info("Routes registered successfully")
@@ -4,19 +4,32 @@ Celery application module for Multi Translate Service
 
 import os
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import task_postrun, task_prerun
 from kombu import Queue
 
+from src.utils import metrics
+from src.utils import profiling
+
 celery_app = Celery("celery_app")
 
 class CeleryConfig:
     # Broker configuration (Redis)
     broker_url = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     result_backend = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+    # Task state lives in the database, nothing reads the result backend
+    task_ignore_result = True
     
     # Task routes configuration
     task_routes = {
         'src.tasks.translation_tasks.stt_task': {
             'queue': 'translation_task_queue'
+        },
+        'src.tasks.maintenance_tasks.maintain_partitions_task': {
+            'queue': 'default'
+        },
+        'src.tasks.maintenance_tasks.reap_expired_leases_task': {
+            'queue': 'default'
         }
     }
     
@@ -27,8 +40,39 @@ class CeleryConfig:
         Queue('translation_task_queue', routing_key='stt'),
     )
 
+    # Periodic tasks configuration (run with celery beat)
+    beat_schedule = {
+        'maintain-partitions': {
+            'task': 'src.tasks.maintenance_tasks.maintain_partitions_task',
+            'schedule': crontab(hour=3, minute=0),
+        },
+        'reap-expired-leases': {
+            'task': 'src.tasks.maintenance_tasks.reap_expired_leases_task',
+            'schedule': 60.0,
+        },
+    }
+
 celery_app.config_from_object(CeleryConfig)
 
 celery_app.autodiscover_tasks([
     'src.tasks.translation_tasks',
-])
\ No newline at end of file
+    'src.tasks.maintenance_tasks',
+])
+
+
+@task_postrun.connect
+def flush_worker_metrics(**kwargs):
+    """Push the counters of this worker process after every task"""
+    metrics.flush_to_redis()
+
+
+if profiling.profiling_enabled():
+    @task_prerun.connect
+    def start_task_profile(task_id=None, **kwargs):
+        """Profile sampled tasks, and every task when a latency threshold is set"""
+        profiling.start_task_profile(task_id)
+
+    @task_postrun.connect
+    def finish_task_profile(task_id=None, task=None, args=None, **kwargs):
+        """Keep the profile of sampled and slow tasks"""
+        profiling.finish_task_profile(task_id, task.name, args)
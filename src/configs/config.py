@@ -3,7 +3,7 @@ Configuration module for Multi Translate Service
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     """Application configuration class"""
@@ -21,10 +21,52 @@ class Settings(BaseSettings):
     
     # Whisper model
     whisper_model: str = "tiny"
+
+    # STT backend configuration
+    stt_backend: str = "whisper"  # whisper or faster_whisper
+    stt_compute_type: str = "int8"  # faster_whisper quantization, e.g. int8, int8_float32, float32
+    stt_cpu_threads: int = 0  # Inference threads, 0 lets the backend decide
+    stt_num_workers: int = 1  # faster_whisper concurrent transcriptions per model
+    stt_batch_size: int = 1  # > 1 batches transcriptions of concurrent tasks, needs a threads worker pool
+    stt_batch_max_wait_ms: int = 200  # Max wait to fill a batch after its first request
+    
+    # Audio preprocessing configuration
+    audio_preprocessing: bool = True  # Decode the download in memory and trim silence, needs ffmpeg
+    audio_silence_threshold_db: float = -45.0  # Frames this much quieter than the loudest frame are silence
+    audio_min_silence: float = 1.0  # Seconds, shorter pauses are kept
+    audio_silence_padding: float = 0.25  # Seconds of silence kept around speech
+    
+    # Speculative translation configuration (Celery worker)
+    speculative_translation: bool = False  # Translate sentences while later audio is still transcribed
+    speculative_chunk_chars: int = 200  # Complete sentences are sent to the LLM in chunks of about this size
+    speculative_max_workers: int = 4  # Concurrent chunk translations per worker process
+    
+    # Async worker configuration (python -m src.tasks.async_worker)
+    async_worker_concurrency: int = 200  # Tasks in flight per async worker process
+    async_worker_stt_processes: int = 2  # Processes running transcription for the async worker
+    
+    # Task lease configuration
+    task_lease_seconds: int = 120  # A processing task without a heartbeat for this long lost its worker
+    task_heartbeat_interval: int = 20  # Seconds between lease extensions, well below task_lease_seconds
+    task_lease_max_expirations: int = 2  # Expired leases re-queued before the task is failed
+    
+    # Stories file configuration
+    stories_file: str = "stories.bin"
+    stories_manifest: Optional[str] = None  # JSON manifest of shard files, replaces stories_file when set
+    stories_reload_interval: float = 5.0  # Seconds between checks for new versions, 0 disables hot reload
+    
+    # Translation memory configuration
+    translation_memory_enabled: bool = True  # Serve stored translations of known stories instead of the LLM
+    translation_memory_threshold: float = 0.9  # Minimum similarity between transcript and stored story
+    translation_memory_candidates: int = 5  # Candidates checked with SimilarityService
     
     # OPENAI API configuration
     openai_api_key: Optional[str] = None
     openai_api_base: Optional[str] = None
+    llm_timeout: float = 120.0  # Seconds per LLM request
+    llm_max_connections: int = 20  # Connections to the LLM API per worker process
+    llm_max_keepalive_connections: int = 10  # Idle connections kept open for the next tasks
+    llm_keepalive_expiry: float = 90.0  # Seconds an idle connection is kept
 
     # Database configuration
     database_host: str = "localhost"
@@ -36,16 +78,49 @@ class Settings(BaseSettings):
     database_pool_size: int = 5
     database_max_overflow: int = 10
     
+    # Read replica configuration, status polls and listings are served from replicas when set
+    database_replica_hosts: str = ""  # Comma separated host or host:port, same user and database as the primary
+    database_replica_pool_size: int = 5  # Pool per replica
+    database_replica_max_overflow: int = 10
+    database_replica_max_lag: float = 5.0  # Seconds of replay lag after which a replica is skipped
+    database_replica_lag_check_interval: float = 2.0  # Seconds a measured replica lag is reused
+
+    # Redis configuration (metrics, worker coordination)
+    redis_url: str = "redis://localhost:6379/0"
+
+    # Partition maintenance configuration
+    partition_premake_months: int = 2  # Monthly partitions created ahead of the current month
+    partition_retention_months: int = 6  # Partitions older than this are dropped
+    partition_archive_dir: Optional[str] = None  # If set, rows are exported here before a partition is dropped
+    
     @property
     def database_url(self) -> str:
         """Generate async database URL from components"""
         return f"postgresql+asyncpg://{self.database_user}:{self.database_password}@{self.database_host}:{self.database_port}/{self.database_name}"
     
+    @property
+    def replica_database_urls(self) -> List[str]:
+        """Async database URLs of the read replicas"""
+        urls = []
+        for host in filter(None, (host.strip() for host in self.database_replica_hosts.split(","))):
+            if ":" not in host:
+                host = f"{host}:{self.database_port}"
+            urls.append(f"postgresql+asyncpg://{self.database_user}:{self.database_password}@{host}/{self.database_name}")
+        return urls
+    
     @property
     def sync_database_url(self) -> str:
         """Generate sync database URL for Celery tasks"""
         return f"postgresql+psycopg2://{self.database_user}:{self.database_password}@{self.database_host}:{self.database_port}/{self.database_name}"
     
+    # Profiling configuration (needs the profiling extra)
+    profiling_enabled: bool = False  # Profile API requests and Celery tasks with pyinstrument
+    profiling_sample_rate: float = 0.01  # Share of requests / tasks profiled
+    profiling_latency_threshold_ms: float = 0  # If > 0, every request / task is profiled and kept when slower
+    profiling_interval: float = 0.001  # Sampling interval in seconds
+    profiling_dir: str = "profiles"
+    profiling_max_files: int = 200  # Oldest profiles are removed beyond this
+    
     # Logging configuration
     log_level: str = "INFO"
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
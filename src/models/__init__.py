@@ -2,13 +2,15 @@
 Model module for Multi Translate Service
 """
 
-from .base import Base, engine, async_session, get_db
-from .translation_model import TranslationTask
+from .base import Base, engine, async_session, get_db, get_read_db
+from .translation_model import TranslationTask, TranslationTaskSubmission
 
 __all__ = [
     "Base",
     "engine", 
     "async_session",
     "get_db",
-    "TranslationTask"
+    "get_read_db",
+    "TranslationTask",
+    "TranslationTaskSubmission"
 ] 
\ No newline at end of file
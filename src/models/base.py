@@ -2,13 +2,16 @@
 Database base configuration for Multi Translate Service
 """
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import create_engine
+import itertools
+import time
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List, Optional, Tuple
 from src.configs.config import settings
 from src.utils.logger import get_logger
+from src.utils import metrics
 
 logger = get_logger(__name__)
 
@@ -28,9 +31,22 @@ engine = create_async_engine(
 async_session = async_sessionmaker(
     engine,
     class_=AsyncSession,
-    expire_on_commit=False
+    expire_on_commit=False,
+    info={"role": "primary"}
 )
 
+# Create async engines for the read replicas, each with its own pool
+replica_engines = [
+    create_async_engine(
+        url,
+        echo=settings.database_echo,
+        pool_size=settings.database_replica_pool_size,
+        max_overflow=settings.database_replica_max_overflow,
+        future=True
+    )
+    for url in settings.replica_database_urls
+]
+
 # Create sync engine for Celery tasks
 sync_engine = create_engine(
     settings.sync_database_url,
@@ -46,6 +62,89 @@ sync_session = sessionmaker(
     expire_on_commit=False
 )
 
+def _is_autocommit(connection) -> bool:
+    return connection.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+def _count_round_trips(target_engine, role: str = "primary") -> None:
+    """Count DB round trips in the process metrics, transaction control included, and statements per role"""
+
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def _on_statement(connection, cursor, statement, parameters, context, executemany):
+        metrics.incr("db_round_trips")
+        metrics.incr(f"db_queries_{role}")
+
+    @event.listens_for(target_engine, "begin")
+    @event.listens_for(target_engine, "commit")
+    @event.listens_for(target_engine, "rollback")
+    def _on_transaction(connection):
+        # No BEGIN / COMMIT reaches the server in autocommit
+        if not _is_autocommit(connection):
+            metrics.incr("db_round_trips")
+
+
+_count_round_trips(engine.sync_engine)
+_count_round_trips(sync_engine)
+for _replica_engine in replica_engines:
+    _count_round_trips(_replica_engine.sync_engine, "replica")
+
+# Replay lag of a replica, 0 when it has replayed everything it received
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """Picks a read replica round robin, skipping replicas lagging more than max_lag seconds"""
+
+    def __init__(self, engines: List[AsyncEngine], max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._sessionmakers = [
+            async_sessionmaker(replica, class_=AsyncSession, expire_on_commit=False, info={"role": "replica"})
+            for replica in engines
+        ]
+        self._engines = engines
+        self._lags = [0.0] * len(engines)
+        self._checked_at = [0.0] * len(engines)
+        self._next = itertools.cycle(range(len(engines)))
+
+    async def _lag(self, i: int) -> float:
+        if time.monotonic() - self._checked_at[i] >= self.check_interval:
+            # Stamped first, concurrent requests reuse the last value instead of checking too
+            self._checked_at[i] = time.monotonic()
+            try:
+                async with self._engines[i].connect() as connection:
+                    self._lags[i] = float((await connection.execute(REPLICA_LAG_QUERY)).scalar() or 0)
+            except Exception as e:
+                logger.warning(f"Failed to check lag of replica {i}: {e}")
+                self._lags[i] = float("inf")
+        return self._lags[i]
+
+    async def sessionmaker(self) -> Optional[Tuple[async_sessionmaker, float]]:
+        """Session maker and measured lag of the next replica within max_lag, None if every replica lags"""
+        for _ in range(len(self._engines)):
+            i = next(self._next)
+            lag = await self._lag(i)
+            if lag <= self.max_lag:
+                return self._sessionmakers[i], lag
+        return None
+
+
+replica_router = ReplicaRouter(
+    replica_engines, settings.database_replica_max_lag, settings.database_replica_lag_check_interval)
+
+
+def is_replica(session: AsyncSession) -> bool:
+    """Whether a session reads from a replica, callers fall back to the primary for rows it may not have yet"""
+    return session.info.get("role") == "replica"
+
+
+def replica_lags(session: AsyncSession) -> bool:
+    """Whether a session reads from a replica that was behind the primary when last measured"""
+    return is_replica(session) and session.info.get("replica_lag", 0) > 0
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Database dependency for FastAPI
@@ -61,6 +160,23 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         finally:
             await session.close()
 
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Read only database dependency for FastAPI, served by a replica when one is configured and caught up
+    """
+    replica = await replica_router.sessionmaker() if replica_engines else None
+    if replica is None:
+        if replica_engines:
+            metrics.incr("db_replica_lag_fallbacks")
+        session = async_session()
+    else:
+        maker, lag = replica
+        # Readers re-check live rows on the primary while the replica is behind
+        session = maker(info={"replica_lag": lag})
+    async with session:
+        # Nothing to commit, closing rolls the read transaction back
+        yield session
+
 def get_sync_db():
     """
     Synchronous database session for Celery tasks
@@ -4,7 +4,8 @@ TranslationTask model for Multi Translate Service
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, JSON, Integer
+from typing import Iterable, Optional
+from sqlalchemy import Column, String, Text, DateTime, JSON, Integer, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from enum import Enum as PyEnum
 from .base import Base
@@ -17,17 +18,28 @@ class TaskStatus(PyEnum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+# Statuses of tasks that are still in flight
+LIVE_STATUSES = [TaskStatus.PENDING.value, TaskStatus.PROCESSING.value]
+# Statuses a task never leaves
+FINISHED_STATUSES = [TaskStatus.COMPLETED.value, TaskStatus.FAILED.value, TaskStatus.CANCELLED.value]
+
+# Fields of TranslationTask.to_dict, each maps to the column of the same name
+TASK_FIELDS = (
+    "id", "task_id", "audio_url", "original_text", "target_languages", "status",
+    "created_at", "updated_at", "stt_result", "translation_results", "error_message",
+)
+
 class TranslationTask(Base):
     """
     Translation task model
     """
     __tablename__ = "translation_tasks"
     
-    # Primary key
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # Primary key, created_at is part of it because the table is range partitioned by created_at
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
-    # Task identification
-    task_id = Column(String(255), unique=True, nullable=False, index=True)
+    # Task identification, unique together with the partition key
+    task_id = Column(String(255), nullable=False)
     
     # Input data
     audio_url = Column(Text, nullable=False)
@@ -35,8 +47,8 @@ class TranslationTask(Base):
     target_languages = Column(JSON, nullable=False) 
     
     # Task status and tracking
-    status = Column(String(50), nullable=False, default=TaskStatus.PENDING.value, index=True)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    status = Column(String(50), nullable=False, default=TaskStatus.PENDING.value)
+    created_at = Column(DateTime, primary_key=True, nullable=False, default=datetime.utcnow)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Processing results
@@ -44,31 +56,52 @@ class TranslationTask(Base):
     stt_result = Column(JSON, nullable=True)  
     # Translation results for each target language
     translation_results = Column(JSON, nullable=True)  
+    # Stage state used to resume retries (downloaded audio reference, attempts per stage)
+    checkpoint = Column(JSON, nullable=True)
+
+    # Lease of the worker processing the task, extended by its heartbeats
+    lease_owner = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
     
     # Error handling
     error_message = Column(Text, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("task_id", "created_at"),
+        # Status filtered listings in (created_at, id) keyset order, split so every row is
+        # in one index only and queries on live tasks never scan finished rows
+        Index(
+            "idx_translation_tasks_live", "status", "created_at", "id",
+            postgresql_where=status.in_(LIVE_STATUSES),
+        ),
+        Index(
+            "idx_translation_tasks_finished", "status", "created_at", "id",
+            postgresql_where=status.in_(FINISHED_STATUSES),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     def __repr__(self):
         return f"<TranslationTask(id={self.id}, task_id={self.task_id}, status={self.status})>"
     
-    def to_dict(self):
-        """Convert model instance to dictionary"""
+    def to_dict(self, fields: Optional[Iterable[str]] = None):
+        """
+        Convert model instance to dictionary
+        
+        Args:
+            fields: Optional subset of TASK_FIELDS, only these attributes are accessed
+                so columns deferred by the query are not loaded
+        """
         try:
-            # Safely access all attributes to handle potential lazy loading
-            id_value = str(self.id) if hasattr(self, 'id') and self.id is not None else None
-            return {
-                "id": id_value,
-                "task_id": self.task_id,
-                "audio_url": self.audio_url,
-                "original_text": self.original_text,
-                "target_languages": self.target_languages,
-                "status": self.status,
-                "created_at": self.created_at.isoformat() if self.created_at else None,
-                "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-                "stt_result": self.stt_result,
-                "translation_results": self.translation_results,
-                "error_message": self.error_message
-            }
+            data = {}
+            for field in fields or TASK_FIELDS:
+                value = getattr(self, field)
+                if isinstance(value, datetime):
+                    value = value.isoformat()
+                elif isinstance(value, uuid.UUID):
+                    value = str(value)
+                data[field] = value
+            return data
         except Exception as e:
             # Log the error and return a minimal dict
             import logging
@@ -79,7 +112,35 @@ class TranslationTask(Base):
                 "status": getattr(self, 'status', None),
                 "error": "Failed to serialize task data"
             } 
-    
+
+
+class TranslationTaskSubmission(Base):
+    """
+    Deduplication ledger entry, maps a submission fingerprint to the task serving it
+    """
+    __tablename__ = "translation_task_submissions"
+
+    # Hash of the idempotency key if given, otherwise of the request payload
+    fingerprint = Column(String(64), primary_key=True)
+    # Hash of the request payload, used to reject reused idempotency keys
+    payload_fingerprint = Column(String(64), nullable=False)
+    idempotency_key = Column(String(255), nullable=True)
+
+    task_id = Column(String(255), nullable=False)
+    # Number of submissions attached to the task after the first one
+    duplicate_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Backs the retention cleanup of old ledger entries
+        Index("idx_translation_task_submissions_created_at", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<TranslationTaskSubmission(fingerprint={self.fingerprint}, task_id={self.task_id})>"
+
 
 # Supported languages
 SUPPORTED_LANGUAGES = [
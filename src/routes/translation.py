@@ -2,37 +2,91 @@
 Translation routes module for Multi Translate Service
 """
 
-from fastapi import APIRouter, Depends
+import json
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from src.schemas.text_schemas import TextQueryParams
-from src.schemas.translation_schemas import TranslationParams
-from src.services.file_decoding_service import FileDecodingService
+from src.schemas.translation_schemas import TranslationParams, TaskBulkStatusParams
+from src.services.story_store import get_story_store
 from src.services.translation_services import TranslationService
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.configs.config import settings
 from src.utils.logger import get_logger
-from src.models.base import get_db
+from src.utils import metrics
+from src.models.base import get_db, get_read_db
+from src.models.translation_model import TaskStatus
 
 # Get logger for this module
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+FIELDS_DESCRIPTION = "Comma separated task fields to return, e.g. status,updated_at"
+
+
+def _task_response(content: Dict, fields: Optional[str]) -> ORJSONResponse:
+    """Render task payloads with orjson, bypassing jsonable_encoder, and count the bytes sent"""
+    response = ORJSONResponse(content)
+    metrics.incr("task_responses")
+    metrics.incr("task_response_bytes", len(response.body))
+    if fields is None:
+        # Full rows, the baseline projected responses are compared against
+        metrics.incr("task_responses_full")
+        metrics.incr("task_response_full_bytes", len(response.body))
+    return response
+
 # Create translation task
 @router.post("/translation_task")
-async def create_task(task: TranslationParams, db: AsyncSession = Depends(get_db)):
+async def create_task(task: TranslationParams, db: AsyncSession = Depends(get_db),
+                      idempotency_key: Optional[str] = Header(None, max_length=255)):
     """Create a new translation task"""
-    task_result = await TranslationService.create_task(db, task)
+    task_result = await TranslationService.create_task(db, task, idempotency_key)
     logger.info(f"Creating translation task: {task_result['task_id']}")
 
-    return {"status": "ok", "data": {"task_id": task_result["task_id"]}}
+    data = {"task_id": task_result["task_id"], "deduplicated": task_result["deduplicated"]}
+    if task_result["deduplicated"]:
+        data["status"] = task_result["status"]
+        data["duplicate_count"] = task_result["duplicate_count"]
+        # Completed tasks are served right away
+        if task_result["status"] == TaskStatus.COMPLETED.value:
+            data["stt_result"] = task_result["stt_result"]
+            data["translation_results"] = task_result["translation_results"]
+    return {"status": "ok", "data": data}
 
 # Get task status
 @router.get("/translation_task/{task_id}")
-async def get_task_status(task_id: str, db: AsyncSession = Depends(get_db)):
+async def get_task_status(task_id: str, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+                          db: AsyncSession = Depends(get_read_db)):
     """Get task status"""
-    task = await TranslationService.get_task(db, task_id)
-    return {"status": "ok", "data": task}
+    task = await TranslationService.get_task(db, task_id, TranslationService.parse_fields(fields))
+    return _task_response({"status": "ok", "data": task}, fields)
+
+# List tasks
+@router.get("/translation_tasks")
+async def list_tasks(
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """List tasks filtered by status and created_at range, paginated by cursor"""
+    result = await TranslationService.list_tasks(
+        db, status, created_from, created_to, limit, cursor, TranslationService.parse_fields(fields))
+    return _task_response({"status": "ok", "data": result}, fields)
+
+# Get status of many tasks
+@router.post("/translation_tasks/status")
+async def get_tasks_status(params: TaskBulkStatusParams, db: AsyncSession = Depends(get_read_db)):
+    """Get status of many tasks"""
+    result = await TranslationService.get_tasks_status(db, params.task_ids)
+    return {"status": "ok", "data": result}
 
 # Cancel task
 @router.post("/translation_task/{task_id}/cancel")
@@ -44,13 +98,54 @@ async def cancel_task(task_id: str, db: AsyncSession = Depends(get_db)):
 @router.post("/query_text")
 async def query_text(params: TextQueryParams, db: AsyncSession = Depends(get_db)):
     """Query text"""
-    file_decoding_service = FileDecodingService()
-    text = file_decoding_service.get_text(params.language, params.text_id, params.source)
+    text = get_story_store().get_text(params.language, params.text_id, params.source)
     return {"status": "ok", "data": text}
 
+# Stream all texts of a language
+@router.get("/texts/language/{language}")
+def list_language_texts(language: str, text_id_prefix: str = ""):
+    """Stream texts of a language, optionally restricted to a text_id prefix, as NDJSON"""
+    # Checked before the response starts, the stream cannot turn into an error status
+    get_story_store().ensure_available()
+    return StreamingResponse(
+        _ndjson(get_story_store().iter_language(language, text_id_prefix)),
+        media_type="application/x-ndjson")
+
+# Stream all languages of a text
+@router.get("/texts/text_id/{text_id}")
+def list_text_id_texts(text_id: str):
+    """Stream texts of a text_id across all languages as NDJSON"""
+    get_story_store().ensure_available()
+    return StreamingResponse(
+        _ndjson(get_story_store().iter_text_id(text_id)),
+        media_type="application/x-ndjson")
+
+# Search texts
+@router.get("/texts/search")
+def search_texts(q: str = Query(..., min_length=3), language: Optional[str] = None,
+                 limit: int = Query(20, ge=1, le=500)):
+    """Find texts containing a phrase, case insensitive"""
+    return {"status": "ok", "data": get_story_store().search(q, language, limit)}
+
+def _ndjson(records: Iterator[Dict[str, str]]) -> Iterator[str]:
+    """Serialize records one JSON document per line"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+# Metrics
+@router.get("/metrics")
+async def get_metrics():
+    """Counters of this API process and of all worker processes"""
+    try:
+        worker_metrics = await run_in_threadpool(metrics.worker_snapshot)
+    except Exception as e:
+        logger.error(f"Failed to read worker metrics: {e}")
+        worker_metrics = None
+    return {"status": "ok", "data": {"api": metrics.snapshot(), "worker": worker_metrics}}
+
 # Health check
 @router.get("/health")
 async def health_check():
     """Health check API"""
     logger.info("Executing health check...")
-    return {"status": "ok", "data": {"environment": settings.environment}} 
\ No newline at end of file
+    return {"status": "ok", "data": {"environment": settings.environment, "stories": get_story_store().versions()}} 
\ No newline at end of file
@@ -8,4 +8,7 @@ from typing import Optional
 class TranslationParams(BaseModel):
     audio_url: str = Field(..., min_length=1, strip_whitespace=True, description="Audio URL is required and cannot be empty or whitespace")
     original_text: Optional[str] = None
-    target_languages: list[str] = Field(..., min_items=1, description="Target languages list cannot be empty")
\ No newline at end of file
+    target_languages: list[str] = Field(..., min_items=1, description="Target languages list cannot be empty")
+
+class TaskBulkStatusParams(BaseModel):
+    task_ids: list[str] = Field(..., min_items=1, max_items=1000, description="Task ids to resolve, at most 1000 per request")
@@ -0,0 +1,206 @@
+"""
+Audio preprocessing before transcription
+
+The download is streamed straight into one ffmpeg process decoding to the 16 kHz mono
+float PCM Whisper works on, so no temp file is written and Whisper does not decode the
+file again. Silent spans are trimmed by frame energy, the spans kept are reported in
+seconds of the original recording.
+"""
+
+import asyncio
+import subprocess
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+import numpy as np
+import requests
+
+from src.configs.config import settings
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+# Whisper input format
+SAMPLE_RATE = 16000
+FFMPEG_DECODE = [
+    "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+    "-i", "pipe:0",
+    "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+    "pipe:1",
+]
+CHUNK_SIZE = 65536
+
+
+class AudioDecodeError(RuntimeError):
+    """ffmpeg rejected the audio, decoding the same bytes again fails the same way"""
+
+
+class AudioPreprocessingService:
+    """Decode, resample and trim audio in memory"""
+
+    @staticmethod
+    def decode(chunks: Iterable[bytes]) -> np.ndarray:
+        """
+        Decode an encoded audio stream with a single ffmpeg process
+
+        Args:
+            chunks: Bytes of the encoded audio, e.g. an HTTP response body
+
+        Returns:
+            float32 mono PCM at SAMPLE_RATE
+
+        Raises:
+            AudioDecodeError: If ffmpeg cannot decode the stream
+        """
+        process = subprocess.Popen(FFMPEG_DECODE, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        # Feed stdin from a thread, ffmpeg blocks on a full stdout pipe otherwise
+        feed_error: List[BaseException] = []
+
+        def feed():
+            try:
+                for chunk in chunks:
+                    if chunk:
+                        process.stdin.write(chunk)
+            except BaseException as e:
+                feed_error.append(e)
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        feeder = threading.Thread(target=feed, name="ffmpeg-feed", daemon=True)
+        feeder.start()
+        pcm = process.stdout.read()
+        stderr = process.stderr.read()
+        process.wait()
+        feeder.join()
+        if feed_error and not isinstance(feed_error[0], BrokenPipeError):
+            raise feed_error[0]
+        if process.returncode != 0:
+            raise AudioDecodeError(f"Failed to decode audio: {stderr.decode(errors='replace').strip()}")
+        return np.frombuffer(pcm, np.float32)
+
+    @staticmethod
+    async def adecode(chunks: AsyncIterator[bytes]) -> np.ndarray:
+        """Async counterpart of decode, for an async HTTP response body"""
+        process = await asyncio.create_subprocess_exec(
+            *FFMPEG_DECODE, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+
+        async def feed():
+            try:
+                async for chunk in chunks:
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                process.stdin.close()
+
+        feeder = asyncio.create_task(feed())
+        try:
+            pcm, stderr = await asyncio.gather(process.stdout.read(), process.stderr.read())
+            await feeder
+        except BaseException:
+            feeder.cancel()
+            process.kill()
+            raise
+        finally:
+            await process.wait()
+        if process.returncode != 0:
+            raise AudioDecodeError(f"Failed to decode audio: {stderr.decode(errors='replace').strip()}")
+        return np.frombuffer(pcm, np.float32)
+
+    @staticmethod
+    def trim_silence(audio: np.ndarray,
+                     threshold_db: float = settings.audio_silence_threshold_db,
+                     min_silence: float = settings.audio_min_silence,
+                     padding: float = settings.audio_silence_padding,
+                     frame: float = 0.03) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+        """
+        Drop silent spans by frame energy
+
+        Args:
+            audio: float32 mono PCM at SAMPLE_RATE
+            threshold_db: Frames quieter than this, relative to the loudest frame, are silence
+            min_silence: Only silences longer than this many seconds are removed
+            padding: Seconds of silence kept around speech so words are not clipped
+            frame: Frame length in seconds
+
+        Returns:
+            Tuple of the trimmed audio and the kept (start, end) sample spans of the original
+        """
+        frame_length = int(frame * SAMPLE_RATE)
+        num_frames = len(audio) // frame_length
+        if num_frames == 0:
+            return audio, [(0, len(audio))] if len(audio) else []
+
+        frames = audio[:num_frames * frame_length].reshape(num_frames, frame_length)
+        energy = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-12)
+        voiced = energy > energy.max() + threshold_db
+        if not voiced.any():
+            # Nothing louder than the rest, leave it to the STT backend
+            return audio, [(0, len(audio))]
+
+        # Voiced frame runs, merged when the silence between them is short
+        pad = int(round(padding / frame))
+        gap = int(round(min_silence / frame))
+        indices = np.flatnonzero(voiced)
+        breaks = np.flatnonzero(np.diff(indices) > gap)
+        run_starts = np.concatenate(([indices[0]], indices[breaks + 1]))
+        run_ends = np.concatenate((indices[breaks], [indices[-1]])) + 1
+
+        spans = []
+        for start, end in zip(run_starts, run_ends):
+            start = max(0, start - pad) * frame_length
+            end = min(num_frames, end + pad) * frame_length
+            if end >= num_frames * frame_length:
+                # Keep the tail that did not fill a frame
+                end = len(audio)
+            if spans and start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], int(end))
+            else:
+                spans.append((int(start), int(end)))
+
+        trimmed = np.concatenate([audio[start:end] for start, end in spans])
+        return trimmed, spans
+
+    @staticmethod
+    def prepare(audio: np.ndarray) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Trim decoded audio and report what was removed
+
+        Returns:
+            Tuple of the audio for the STT backend and the preprocessing report
+        """
+        trimmed, spans = AudioPreprocessingService.trim_silence(audio)
+        duration = len(audio) / SAMPLE_RATE
+        removed = (len(audio) - len(trimmed)) / SAMPLE_RATE
+        metrics.incr("audio_seconds_decoded", duration)
+        metrics.incr("audio_seconds_removed", removed)
+        logger.info(f"Trimmed {removed:.1f}s of silence from {duration:.1f}s of audio")
+        return trimmed, {
+            "duration": round(duration, 3),
+            "removed_seconds": round(removed, 3),
+            # The STT result carries no timestamps, the spans locate the transcript in the recording
+            "kept_spans": [[round(start / SAMPLE_RATE, 3), round(end / SAMPLE_RATE, 3)] for start, end in spans],
+        }
+
+    @staticmethod
+    def load_url(url: str) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Download, decode and trim an audio URL without a temp file"""
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            audio = AudioPreprocessingService.decode(response.iter_content(chunk_size=CHUNK_SIZE))
+        return AudioPreprocessingService.prepare(audio)
+
+    @staticmethod
+    async def aload_url(url: str, client) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Async counterpart of load_url, trimming runs in a thread"""
+        async with client.stream("GET", url, follow_redirects=True) as response:
+            response.raise_for_status()
+            audio = await AudioPreprocessingService.adecode(response.aiter_bytes(chunk_size=CHUNK_SIZE))
+        return await asyncio.to_thread(AudioPreprocessingService.prepare, audio)
@@ -0,0 +1,82 @@
+"""
+Cooperative cancellation of running translation tasks
+
+The API sets a Redis flag holding the time of the cancel request. Workers check it
+between transcription windows, between stages and before each LLM call, and stop the
+task by raising TaskCancelled, so the worker process and its loaded model survive.
+"""
+
+import time
+from typing import Callable, Optional
+
+from src.utils.logger import get_logger
+from src.utils import metrics
+from src.utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+CANCEL_KEY = "task:cancel:{task_id}"
+# A flag outlives any retry countdown of the task
+CANCEL_FLAG_TTL = 24 * 3600
+
+
+class TaskCancelled(Exception):
+    """The task was cancelled while it was running"""
+
+    def __init__(self, task_id: str):
+        super().__init__(f"Task cancelled: {task_id}")
+        self.task_id = task_id
+
+    def __reduce__(self):
+        # Raised in STT pool processes and pickled back to the worker
+        return TaskCancelled, (self.task_id,)
+
+
+class CancellationService:
+    """Cancel flags of translation tasks"""
+
+    @staticmethod
+    def request(task_id: str) -> None:
+        """Flag a task as cancelled, stamped with the request time"""
+        get_redis().set(CANCEL_KEY.format(task_id=task_id), time.time(), ex=CANCEL_FLAG_TTL)
+
+    @staticmethod
+    def requested_at(task_id: str) -> Optional[float]:
+        """Time of the cancel request, None if the task was not cancelled"""
+        value = get_redis().get(CANCEL_KEY.format(task_id=task_id))
+        return float(value) if value is not None else None
+
+    @staticmethod
+    def check(task_id: str) -> None:
+        """
+        Raise TaskCancelled if the task was cancelled
+
+        Raises:
+            TaskCancelled: If the cancel flag of the task is set
+        """
+        if get_redis().exists(CANCEL_KEY.format(task_id=task_id)):
+            raise TaskCancelled(task_id)
+
+    @staticmethod
+    def checker(task_id: str) -> Callable[[], None]:
+        """Check callable for code that only knows about audio, picklable for process pools"""
+        return _Checker(task_id)
+
+    @staticmethod
+    def record_slot_freed(task_id: str) -> None:
+        """Measure the time from the cancel request to the worker slot being free again"""
+        requested_at = CancellationService.requested_at(task_id)
+        if requested_at is None:
+            return
+        latency = max(0.0, time.time() - requested_at)
+        metrics.incr("cancellations_observed")
+        metrics.incr("cancel_latency_seconds_total", latency)
+        logger.info(f"Task {task_id} stopped {latency:.2f}s after its cancel request")
+
+
+class _Checker:
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+
+    def __call__(self) -> None:
+        CancellationService.check(self.task_id)
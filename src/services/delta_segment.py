@@ -0,0 +1,127 @@
+"""
+Append-only delta segment of a stories.bin file
+
+A delta segment lives next to its base file as <base>.delta and holds the records
+added, updated or deleted since the base was generated. Every record is framed as
+
+    op (1 byte) | language length (1) | text_id length (1) | source length (1) |
+    content length (uint32) | language | text_id | source | content
+
+op is 1 for a new or updated text and 2 for a tombstone. Later records override earlier
+ones with the same (language, text_id). A truncated trailing record from an interrupted
+append is ignored.
+"""
+
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DELTA_RECORD = struct.Struct("<BBBBI")
+OP_PUT = 1
+OP_DELETE = 2
+
+
+class DeltaEntry(NamedTuple):
+    """Latest state of a key in the delta segment"""
+    deleted: bool
+    source: str
+    offset: int
+    length: int
+
+
+def delta_path(base_path: str) -> str:
+    """Path of the delta segment of a base file"""
+    return f"{base_path}.delta"
+
+
+def encode_delta_record(op: int, language: str, text_id: str, source: str = "", content: str = "") -> bytes:
+    """Encode one delta record"""
+    language_bytes = language.encode("utf-8")
+    text_id_bytes = text_id.encode("utf-8")
+    source_bytes = source.encode("utf-8")
+    content_bytes = content.encode("utf-8")
+    return (
+        DELTA_RECORD.pack(op, len(language_bytes), len(text_id_bytes), len(source_bytes), len(content_bytes))
+        + language_bytes + text_id_bytes + source_bytes + content_bytes
+    )
+
+
+class DeltaSegment:
+    """Memory mapped delta segment with a sorted in-memory index of its latest entries"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.entries: Dict[Tuple[str, str], DeltaEntry] = {}
+        # Bytes of complete records, the rest is a torn append
+        self.size = self._load()
+        self.keys: List[Tuple[str, str]] = sorted(self.entries)
+        self._text_ids: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        for key in self.keys:
+            self._text_ids[key[1]].append(key)
+        logger.info(f"loaded delta segment {path}: {len(self.entries)} keys, {self.size} bytes")
+
+    @classmethod
+    def open(cls, path: str) -> Optional["DeltaSegment"]:
+        """Open a delta segment, None if it does not exist or is empty"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        return cls(path)
+
+    def _load(self) -> int:
+        position = 0
+        total = len(self._mm)
+        while position + DELTA_RECORD.size <= total:
+            op, language_length, text_id_length, source_length, content_length = DELTA_RECORD.unpack_from(self._mm, position)
+            start = position + DELTA_RECORD.size
+            end = start + language_length + text_id_length + source_length + content_length
+            if end > total:
+                logger.warning(f"ignoring truncated record at {position} in {self.path}")
+                break
+            language = self._mm[start:start + language_length].decode("utf-8")
+            start += language_length
+            text_id = self._mm[start:start + text_id_length].decode("utf-8")
+            start += text_id_length
+            source = self._mm[start:start + source_length].decode("utf-8")
+            start += source_length
+            self.entries[(language, text_id)] = DeltaEntry(op == OP_DELETE, source, start, content_length)
+            position = end
+        return position
+
+    def close(self) -> None:
+        """Release the file mapping"""
+        self._mm.close()
+
+    def get(self, language: str, text_id: str) -> Optional[DeltaEntry]:
+        """Latest entry of a key, None if the delta does not touch it"""
+        return self.entries.get((language, text_id))
+
+    def read_content(self, entry: DeltaEntry) -> str:
+        """Read the text of a put entry"""
+        return self._mm[entry.offset:entry.offset + entry.length].decode("utf-8")
+
+    def iter_range(self, language: str, text_id_prefix: str = "") -> Iterator[Tuple[Tuple[str, str], DeltaEntry]]:
+        """Iterate the entries of a language in text_id order, optionally restricted to a text_id prefix"""
+        position = bisect_left(self.keys, (language, text_id_prefix))
+        while position < len(self.keys):
+            key = self.keys[position]
+            if key[0] != language or not key[1].startswith(text_id_prefix):
+                break
+            yield key, self.entries[key]
+            position += 1
+
+    def keys_for_text_id(self, text_id: str) -> List[Tuple[str, str]]:
+        """Keys of a text_id across languages, sorted by language"""
+        return self._text_ids.get(text_id, [])
+
+    def languages(self) -> List[str]:
+        """Languages with at least one live text in the delta"""
+        return sorted({key[0] for key, entry in self.entries.items() if not entry.deleted})
@@ -2,15 +2,25 @@
 File decoding service
 """
 
+import mmap
+import os
 import struct
-from typing import Optional
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
 from fastapi import HTTPException
 
-from src.models.translation_model import TranslationTask
+from src.services.delta_segment import DeltaEntry, DeltaSegment, delta_path
+from src.services.trigram_index import TrigramIndex, normalize, trigram_index_path, trigrams
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Metadata header: num_records, index_length, data_offset
+HEADER = struct.Struct("<IIQ")
+# Index record: language, text_id, source, offset, length (41 bytes)
+INDEX_RECORD = struct.Struct("<8s16s5sQI")
+
 
 class FileDecodingService:
     """File decoding service"""
@@ -19,66 +29,283 @@ class FileDecodingService:
         self.file_path = file_path
         try:
             with open(file_path, "rb") as f:
-                self.num_records, self.index_length, self.data_offset = struct.unpack(
-                    "<IIQ", f.read(16)
-                )
+                # Map the whole file, lookups and scans read pages straight from the page cache
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.num_records, self.index_length, self.data_offset = HEADER.unpack_from(self._mm, 0)
             logger.info(
                 f"initialized StoryReader: num_records={self.num_records}, data_offset={self.data_offset}")
         except Exception as e:
             logger.error(f"failed to initialize StoryReader: {str(e)}")
             raise HTTPException(
                 status_code=500, detail=f"failed to initialize FileDecodingService: {str(e)}")
+        # text_id -> index record positions, built on first use
+        self._text_id_index: Optional[Dict[str, List[int]]] = None
+        # Records appended since the base file was generated, checked before the base
+        self.delta = DeltaSegment.open(delta_path(file_path))
+        # Optional trigram index of the base file for phrase search and find_similar
+        self._warned_no_index = False
+        index_path = trigram_index_path(file_path)
+        self.trigram_index = (TrigramIndex.open(index_path, self.num_records, self.fingerprint())
+                              if os.path.exists(index_path) else None)
+
+    def close(self) -> None:
+        """Release the file mappings"""
+        self._mm.close()
+        if self.delta is not None:
+            self.delta.close()
+        if self.trigram_index is not None:
+            self.trigram_index.close()
+
+    def fingerprint(self) -> int:
+        """CRC32 of the header and index area, changes when the base file is generated from other records"""
+        with memoryview(self._mm) as view:
+            area = view[:HEADER.size + self.num_records * INDEX_RECORD.size]
+            try:
+                return zlib.crc32(area)
+            finally:
+                area.release()
+
+    def languages(self) -> List[str]:
+        """Distinct languages of the file, one binary search per language"""
+        languages = []
+        position = 0
+        while position < self.num_records:
+            language = self._read_record(position)[0]
+            languages.append(language)
+            # Skip to the first record of the next language
+            position = self._lower_bound((language, "\U0010ffff"))
+        if self.delta is not None:
+            languages = sorted(set(languages) | set(self.delta.languages()))
+        return languages
+
+    def _read_record(self, position: int) -> Tuple[str, str, str, int, int]:
+        """Read the index record at a position"""
+        lang, tid, src, offset, length = INDEX_RECORD.unpack_from(
+            self._mm, HEADER.size + position * INDEX_RECORD.size)
+        return (
+            lang.decode("utf-8").rstrip("\x00"),
+            tid.decode("utf-8").rstrip("\x00"),
+            src.decode("utf-8").rstrip("\x00"),
+            offset,
+            length,
+        )
+
+    def _read_content(self, offset: int, length: int) -> str:
+        """Read a text from the data area"""
+        start = self.data_offset + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _lower_bound(self, key: Tuple[str, str]) -> int:
+        """Position of the first index record whose (language, text_id) is not less than key"""
+        low, high = 0, self.num_records
+        while low < high:
+            mid = (low + high) // 2
+            if self._read_record(mid)[:2] < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
 
     def get_text(self, language: str, text_id: str, source: Optional[str] = None) -> str:
         """
         Get text content by language, text_id and source
         """
         try:
-            # Build query key
-            key = (language, text_id, source) if source else (
-                language, text_id)
-
-            # Read index area
-            with open(self.file_path, "rb") as f:
-                # Skip metadata header
-                f.seek(16)  
-                low, high = 0, self.num_records
-                while low < high:
-                    mid = (low + high) // 2
-                    # Each index record is 41 bytes
-                    f.seek(16 + mid * 41)  
-                    lang = f.read(8).decode("utf-8").rstrip("\x00")
-                    tid = f.read(16).decode("utf-8").rstrip("\x00")
-                    src = f.read(5).decode("utf-8").rstrip("\x00")
-                    offset, length = struct.unpack("<QI", f.read(12))
-
-                    if (lang, tid) < key[:2]:
-                        low = mid + 1
-                    elif (lang, tid) > key[:2]:
-                        high = mid
-                    else:
-                        if source and src != source:
-                            logger.error(f"source mismatch: expected {source}, actual {src}")
-                            raise HTTPException(
-                                status_code=404, detail=f"source mismatch: expected {source}, actual {src}")
-                        break
-                else:
+            entry = self.delta.get(language, text_id) if self.delta is not None else None
+            if entry is not None:
+                # Newest version lives in the delta segment, a tombstone hides the base record
+                if entry.deleted:
+                    logger.error(f"not found: language {language}, text id {text_id}")
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"not found: language {language}, text id {text_id}"
+                    )
+                src = entry.source
+            else:
+                position = self._lower_bound((language, text_id))
+                if position >= self.num_records or self._read_record(position)[:2] != (language, text_id):
                     logger.error(f"not found: language {language}, text id {text_id}")
                     raise HTTPException(
                         status_code=404,
                         detail=f"not found: language {language}, text id {text_id}"
                     )
+                _, _, src, offset, length = self._read_record(position)
 
-            # Read data area
-            with open(self.file_path, "rb") as f:
-                f.seek(self.data_offset + offset)
-                content = f.read(length).decode("utf-8")
-                logger.info(
-                    f"query success: {language}, {text_id}, {source}, content: {content}")
-                return content
+            if source and src != source:
+                logger.error(f"source mismatch: expected {source}, actual {src}")
+                raise HTTPException(
+                    status_code=404, detail=f"source mismatch: expected {source}, actual {src}")
+
+            content = self.delta.read_content(entry) if entry is not None else self._read_content(offset, length)
+            logger.info(
+                f"query success: {language}, {text_id}, {source}, content: {content}")
+            return content
 
         except HTTPException:
             raise
         except Exception as e:
             logger.error(f"query failed: {str(e)}")
             raise HTTPException(status_code=500, detail=f"query failed: {str(e)}")
+
+    def iter_language(self, language: str, text_id_prefix: str = "") -> Iterator[Dict[str, str]]:
+        """
+        Iterate the texts of a language in text_id order, optionally restricted to a text_id prefix
+        
+        The index is sorted by (language, text_id), so matching records are contiguous:
+        one binary search finds the first one and the scan stops at the first mismatch.
+        """
+        base_records = self._iter_base_language(language, text_id_prefix)
+        if self.delta is None:
+            yield from base_records
+            return
+
+        # Merge the two sorted streams, delta entries win and tombstones drop the key
+        delta_entries = self.delta.iter_range(language, text_id_prefix)
+        base_record = next(base_records, None)
+        delta_item = next(delta_entries, None)
+        while base_record is not None or delta_item is not None:
+            base_key = (base_record["language"], base_record["text_id"]) if base_record is not None else None
+            if delta_item is None or (base_key is not None and base_key < delta_item[0]):
+                yield base_record
+                base_record = next(base_records, None)
+                continue
+            key, entry = delta_item
+            if not entry.deleted:
+                yield self._delta_record(key, entry)
+            if base_key == key:
+                base_record = next(base_records, None)
+            delta_item = next(delta_entries, None)
+
+    def _iter_base_language(self, language: str, text_id_prefix: str) -> Iterator[Dict[str, str]]:
+        """Range scan over the base file only"""
+        position = self._lower_bound((language, text_id_prefix))
+        while position < self.num_records:
+            lang, tid, src, offset, length = self._read_record(position)
+            if lang != language or not tid.startswith(text_id_prefix):
+                break
+            yield {"language": lang, "text_id": tid, "source": src, "content": self._read_content(offset, length)}
+            position += 1
+
+    def _delta_record(self, key: Tuple[str, str], entry: DeltaEntry) -> Dict[str, str]:
+        return {"language": key[0], "text_id": key[1], "source": entry.source, "content": self.delta.read_content(entry)}
+
+    def iter_text_id(self, text_id: str) -> Iterator[Dict[str, str]]:
+        """Iterate the texts of a text_id across all languages"""
+        delta_keys = self.delta.keys_for_text_id(text_id) if self.delta is not None else []
+        overridden = {key[0] for key in delta_keys}
+        records = []
+        for position in self._get_text_id_index().get(text_id, []):
+            lang, tid, src, offset, length = self._read_record(position)
+            if lang not in overridden:
+                records.append({"language": lang, "text_id": tid, "source": src, "content": self._read_content(offset, length)})
+        for key in delta_keys:
+            entry = self.delta.get(*key)
+            if not entry.deleted:
+                records.append(self._delta_record(key, entry))
+        yield from sorted(records, key=lambda record: record["language"])
+
+    def iter_base_contents(self) -> Iterator[Tuple[int, str]]:
+        """Iterate (index record position, text content) over the base file, ignoring the delta segment"""
+        for position in range(self.num_records):
+            _, _, _, offset, length = self._read_record(position)
+            yield position, self._read_content(offset, length)
+
+    def search(self, query: str, language: Optional[str] = None, limit: int = 20) -> List[Dict[str, str]]:
+        """
+        Find texts containing a phrase, case insensitive
+        
+        Candidates come from the trigram index when there is one and are verified against the
+        mapped data area, without an index every record of the range is checked.
+        Delta segment texts are checked directly and replace the base records they override.
+        
+        Args:
+            query: Phrase to look for
+            language: Optional language filter
+            limit: Maximum number of results
+        """
+        needle = normalize(query)
+        results = []
+
+        if self.delta is not None:
+            for key in self.delta.keys:
+                entry = self.delta.get(*key)
+                if entry.deleted or (language is not None and key[0] != language):
+                    continue
+                record = self._delta_record(key, entry)
+                if needle in normalize(record["content"]):
+                    results.append(record)
+                    if len(results) >= limit:
+                        return results
+
+        # Records of one language are contiguous in the index
+        if language is not None:
+            low, high = self._lower_bound((language, "")), self._lower_bound((language, "\U0010ffff"))
+        else:
+            low, high = 0, self.num_records
+
+        if self.trigram_index is not None and len(needle) >= 3:
+            positions = self.trigram_index.candidates(needle, low, high)
+        else:
+            positions = range(low, high)
+
+        for position in positions:
+            lang, tid, src, offset, length = self._read_record(position)
+            if self.delta is not None and self.delta.get(lang, tid) is not None:
+                continue
+            content = self._read_content(offset, length)
+            if needle in normalize(content):
+                results.append({"language": lang, "text_id": tid, "source": src, "content": content})
+                if len(results) >= limit:
+                    break
+        return results
+
+    def find_similar(self, text: str, language: str, top: int = 5) -> List[Dict[str, str]]:
+        """
+        Texts of a language sharing the most trigrams with a text, best first
+        
+        Base candidates come from the trigram index, a base file without one only matches its
+        delta segment texts. Translation memory relies on this, ship the .tri sidecar with the base file.
+        """
+        needle = normalize(text)
+        needle_trigrams = trigrams(needle)
+        scored = []
+
+        if self.trigram_index is not None:
+            low, high = self._lower_bound((language, "")), self._lower_bound((language, "\U0010ffff"))
+            for rank, position in enumerate(self.trigram_index.similar_candidates(needle, low, high, top=top)):
+                lang, tid, src, offset, length = self._read_record(position)
+                if self.delta is not None and self.delta.get(lang, tid) is not None:
+                    continue
+                record = {"language": lang, "text_id": tid, "source": src, "content": self._read_content(offset, length)}
+                scored.append((rank, record))
+        elif not self._warned_no_index:
+            # Scoring every base record per task would be a full scan of the language
+            self._warned_no_index = True
+            logger.warning(f"{self.file_path} has no trigram index, similar texts are only looked up in its delta segment")
+
+        if self.delta is not None:
+            delta_scored = []
+            for key, entry in self.delta.iter_range(language):
+                if entry.deleted:
+                    continue
+                record = self._delta_record(key, entry)
+                score = len(needle_trigrams & trigrams(normalize(record["content"])))
+                # Unrelated texts would push base candidates out of the top
+                if score:
+                    delta_scored.append((score, record))
+            delta_scored.sort(key=lambda item: item[0], reverse=True)
+            # Interleave with the base candidates, they are ranked on different scales
+            scored.extend((rank + 0.5, record) for rank, (_, record) in enumerate(delta_scored[:top]))
+
+        scored.sort(key=lambda item: item[0])
+        return [record for _, record in scored[:top]]
+
+    def _get_text_id_index(self) -> Dict[str, List[int]]:
+        """Secondary index from text_id to index record positions, built with one pass over the index area"""
+        if self._text_id_index is None:
+            index = defaultdict(list)
+            for position in range(self.num_records):
+                index[self._read_record(position)[1]].append(position)
+            self._text_id_index = dict(index)
+            logger.info(f"built text_id index: {len(index)} text ids")
+        return self._text_id_index
@@ -0,0 +1,94 @@
+"""
+Language normalization service
+"""
+
+from typing import Dict, List, Optional
+
+from src.models.translation_model import SUPPORTED_LANGUAGES
+from src.utils.logger import get_logger
+
+try:
+    import opencc
+except ImportError:  # optional, zh-Hans <-> zh-Hant conversion falls back to the LLM
+    opencc = None
+
+logger = get_logger(__name__)
+
+# Common characters that differ between the two Chinese scripts, aligned pairwise
+TRADITIONAL_ONLY = "這們個來說時會對後國過還學麼為與點見長開問關無樣經發現讓聽話語書車東氣電買賣門邊裡頭愛歡樂機間覺結當體實從場"
+SIMPLIFIED_ONLY = "这们个来说时会对后国过还学么为与点见长开问关无样经发现让听话语书车东气电买卖门边里头爱欢乐机间觉结当体实从场"
+
+
+class LanguageService:
+    """Service mapping detected languages onto supported codes and handling same-language targets"""
+
+    _converters: Dict[str, "opencc.OpenCC"] = {}
+
+    @staticmethod
+    def normalize(code: Optional[str], text: str) -> Optional[str]:
+        """
+        Map a Whisper language code onto a supported language code
+        
+        Whisper reports Chinese as "zh" for both scripts, the script is taken from the text.
+        
+        Args:
+            code: Language code detected by Whisper
+            text: Transcribed text
+            
+        Returns:
+            Supported language code, or None if the language is not supported
+        """
+        if not code:
+            return None
+        code = code.strip()
+        if code.lower() == "zh" or code.lower().startswith("zh-"):
+            return LanguageService.detect_chinese_script(text)
+        if code.lower() in SUPPORTED_LANGUAGES:
+            return code.lower()
+        return None
+
+    @staticmethod
+    def detect_chinese_script(text: str) -> str:
+        """Tell zh-Hans from zh-Hant, text without distinguishing characters is treated as zh-Hans"""
+        traditional = sum(text.count(char) for char in set(TRADITIONAL_ONLY))
+        simplified = sum(text.count(char) for char in set(SIMPLIFIED_ONLY))
+        return "zh-Hant" if traditional > simplified else "zh-Hans"
+
+    @staticmethod
+    def translate_locally(text: str, source_language: Optional[str], target_languages: List[str]) -> Dict[str, str]:
+        """
+        Produce the translations that do not need the LLM
+        
+        Targets matching the source language get the text as is, the other Chinese
+        script is converted with OpenCC when it is installed.
+        
+        Args:
+            text: Transcribed text
+            source_language: Normalized source language
+            target_languages: Requested target languages
+            
+        Returns:
+            Dictionary of the translations produced locally, keyed by language code
+        """
+        translations = {}
+        if source_language is None:
+            return translations
+        for language in target_languages:
+            if language == source_language:
+                translations[language] = text
+            elif {language, source_language} == {"zh-Hans", "zh-Hant"}:
+                converted = LanguageService.convert_chinese_script(text, language)
+                if converted is not None:
+                    translations[language] = converted
+        return translations
+
+    @staticmethod
+    def convert_chinese_script(text: str, target_language: str) -> Optional[str]:
+        """Convert Chinese text to the script of target_language, None if OpenCC is not installed"""
+        if opencc is None:
+            return None
+        config = "s2t" if target_language == "zh-Hant" else "t2s"
+        converter = LanguageService._converters.get(config)
+        if converter is None:
+            converter = LanguageService._converters[config] = opencc.OpenCC(config)
+        return converter.convert(text)
@@ -0,0 +1,132 @@
+"""
+Task leases: heartbeats of Celery worker processes and the reaper of expired leases
+
+Each worker process runs one daemon thread extending the leases of the tasks it is
+running with a single UPDATE every task_heartbeat_interval seconds. A task whose worker
+died stops being extended and is picked up by the lease reaper once its lease expires.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.configs.config import settings
+from src.models.translation_model import TranslationTask, TaskStatus
+from src.services.task_state_repository import TaskStateRepository
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+# Expired leases handled per reaper run
+REAP_BATCH_SIZE = 500
+
+
+class LeaseKeeper:
+    """Heartbeat thread of the current process"""
+
+    _lock = threading.Lock()
+    _task_ids: Set[str] = set()
+    _thread: Optional[threading.Thread] = None
+    _pid: Optional[int] = None
+
+    @classmethod
+    def hold(cls, task_id: str) -> None:
+        """Start extending the lease of a task taken by TaskStateRepository.start"""
+        with cls._lock:
+            if cls._pid != os.getpid():
+                # Forked children inherit the set but not the thread
+                cls._task_ids = set()
+                cls._thread = None
+                cls._pid = os.getpid()
+            cls._task_ids.add(task_id)
+            if cls._thread is None:
+                cls._thread = threading.Thread(target=cls._run, name="lease-heartbeat", daemon=True)
+                cls._thread.start()
+
+    @classmethod
+    def release(cls, task_id: str) -> None:
+        """Stop extending the lease of a task"""
+        with cls._lock:
+            cls._task_ids.discard(task_id)
+
+    @classmethod
+    def _run(cls) -> None:
+        repository = TaskStateRepository()
+        while True:
+            time.sleep(settings.task_heartbeat_interval)
+            with cls._lock:
+                task_ids = list(cls._task_ids)
+            if not task_ids:
+                continue
+            try:
+                repository.heartbeat(task_ids)
+                metrics.incr("lease_heartbeats")
+            except Exception as e:
+                logger.warning(f"Failed to extend task leases: {e}")
+
+
+class LeaseReaper:
+    """Resolves processing tasks whose worker stopped sending heartbeats"""
+
+    @staticmethod
+    def reap_expired(db: Session, max_expirations: int = settings.task_lease_max_expirations
+                     ) -> Tuple[List[str], List[str]]:
+        """
+        Re-queue or fail processing tasks with an expired lease
+
+        Re-queued tasks stay processing with a released lease, like a task waiting for its
+        retry, so the next attempt takes it and resumes from the first incomplete stage. If
+        that attempt is never published the lease expires again and the task is re-queued on
+        a later run. A task that already lost more than max_expirations workers is failed
+        instead, it most likely takes its worker down. Released leases are not counted, no
+        worker was lost.
+
+        Args:
+            db: Sync database session, committed here
+            max_expirations: Expired leases re-queued before the task is failed
+
+        Returns:
+            Tuple of the re-queued task_ids, to be published by the caller, and the failed task_ids
+        """
+        now = datetime.now(timezone.utc)
+        # Concurrent reapers skip each other's rows
+        tasks = db.execute(
+            select(TranslationTask)
+            .where(TranslationTask.status == TaskStatus.PROCESSING.value,
+                   TranslationTask.lease_expires_at < now)
+            .limit(REAP_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        requeued, failed = [], []
+        for task in tasks:
+            checkpoint = dict(task.checkpoint or {})
+            expirations = checkpoint.get("lease_expirations", 0)
+            if task.lease_owner is not None:
+                expirations += 1
+                checkpoint["lease_expirations"] = expirations
+                task.checkpoint = checkpoint
+                logger.warning(f"Lease of {task.task_id} held by {task.lease_owner} expired ({expirations})")
+            else:
+                logger.warning(f"Released lease of {task.task_id} expired before the next attempt started")
+            task.updated_at = now
+            task.lease_owner = None
+            if expirations > max_expirations:
+                task.status = TaskStatus.FAILED.value
+                task.error_message = f"Task lost: worker lease expired {expirations} times"
+                task.lease_expires_at = None
+                failed.append(task.task_id)
+            else:
+                # Taken by the attempt published by the caller, reaped again if it never starts
+                task.lease_expires_at = now + timedelta(seconds=settings.task_lease_seconds)
+                requeued.append(task.task_id)
+        db.commit()
+
+        metrics.incr("leases_expired", len(tasks))
+        return requeued, failed
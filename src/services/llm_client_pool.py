@@ -0,0 +1,99 @@
+"""
+Process level pool of LLM clients
+
+Clients are keyed by model and base URL and share one keep-alive HTTP connection pool
+per process, so consecutive tasks reuse the TLS connection to the LLM API instead of
+handshaking again. Every request is traced to count new and reused connections and the
+time spent connecting.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from src.configs.config import settings
+from src.utils import metrics
+
+# Trace events sent once the connection of a request is established
+_REQUEST_SENT = ("http11.send_request_headers.started", "http2.send_request_headers.started")
+
+
+class _ConnectionTrace:
+    """httpcore trace callback of one request"""
+
+    def __init__(self):
+        self.connect_started: Optional[float] = None
+        self.connected: Optional[float] = None
+
+    def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        if event == "connection.connect_tcp.started":
+            self.connect_started = time.perf_counter()
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            # Plain HTTP stops after TCP, the TLS event then overwrites the elapsed time
+            self.connected = time.perf_counter()
+        elif event in _REQUEST_SENT:
+            if self.connect_started is None:
+                metrics.incr("llm_connections_reused")
+            else:
+                metrics.incr("llm_connections_opened")
+                metrics.incr("llm_handshake_seconds_total", self.connected - self.connect_started)
+
+
+class _AsyncConnectionTrace(_ConnectionTrace):
+    async def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        super().__call__(event, info)
+
+
+def _trace_request(request: httpx.Request) -> None:
+    request.extensions["trace"] = _ConnectionTrace()
+
+
+async def _atrace_request(request: httpx.Request) -> None:
+    request.extensions["trace"] = _AsyncConnectionTrace()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=settings.llm_max_connections,
+                        max_keepalive_connections=settings.llm_max_keepalive_connections,
+                        keepalive_expiry=settings.llm_keepalive_expiry)
+
+
+_lock = threading.Lock()
+# Keyed by pid too, forked worker children must not share the parent's sockets
+_http_clients: Dict[Tuple[int, str], Any] = {}
+_chat_models: Dict[Tuple[int, str, Optional[str]], ChatOpenAI] = {}
+
+
+def _http_client(kind: str):
+    key = (os.getpid(), kind)
+    client = _http_clients.get(key)
+    if client is None:
+        if kind == "async":
+            # Bound to the event loop of the first request, the async worker runs a single loop
+            client = httpx.AsyncClient(limits=_limits(), timeout=settings.llm_timeout,
+                                       event_hooks={"request": [_atrace_request]})
+        else:
+            client = httpx.Client(limits=_limits(), timeout=settings.llm_timeout,
+                                  event_hooks={"request": [_trace_request]})
+        _http_clients[key] = client
+    return client
+
+
+def get_chat_model(model_name: str) -> ChatOpenAI:
+    """Chat model of a model and the configured base URL, shared by all tasks of this process"""
+    key = (os.getpid(), model_name, settings.openai_api_base)
+    llm = _chat_models.get(key)
+    if llm is not None:
+        return llm
+    with _lock:
+        llm = _chat_models.get(key)
+        if llm is None:
+            llm = ChatOpenAI(model=model_name, api_key=settings.openai_api_key, base_url=settings.openai_api_base,
+                             http_client=_http_client("sync"), http_async_client=_http_client("async"))
+            _chat_models[key] = llm
+            metrics.incr("llm_clients_created")
+        return llm
@@ -2,7 +2,9 @@
 LLM translate service
 """
 
-from langchain_openai import ChatOpenAI
+import os
+from functools import lru_cache
+
 from langchain_core.output_parsers import JsonOutputParser
 
 from pydantic import BaseModel, Field
@@ -10,6 +12,7 @@ from pydantic import BaseModel, Field
 from src.utils.logger import get_logger
 from src.configs.config import settings
 from src.prompts.prompt import multi_translate_prompt
+from src.services.llm_client_pool import get_chat_model
 
 logger = get_logger(__name__)
 
@@ -21,7 +24,8 @@ class LLMTranslateService:
     """ Translate service using LLM """
     
     def __init__(self, model_name: str = "gpt-4o-mini"):
-        self.llm = ChatOpenAI(model=model_name, api_key=settings.openai_api_key, base_url=settings.openai_api_base)
+        # Cheap to create per task, the client and its connections come from the process pool
+        self.llm = get_chat_model(model_name)
         self.model_name = model_name
 
     def translate(self, original_text: str, target_languages: list[str]):
@@ -36,14 +40,43 @@ class LLMTranslateService:
             TranslationResult: Dictionary format with language codes as keys and translated text as values
         """
         
-        languages_str = ", ".join(target_languages)
+        chain = self._build_chain()
 
-        parser = JsonOutputParser(pydantic_object=TranslationResult)
+        result = chain.invoke(self._chain_input(original_text, target_languages))
+        
+        logger.info(f"Result: {result}")
 
-        chain = multi_translate_prompt | self.llm | parser
+        return result
 
-        result = chain.invoke({"original_text": original_text, "languages_str": languages_str})
+    async def atranslate(self, original_text: str, target_languages: list[str]):
+        """
+        Translate text to multiple target languages without blocking the event loop
         
+        Args:
+            original_text: Text to translate
+            target_languages: List of target language codes
+            
+        Returns:
+            TranslationResult: Dictionary format with language codes as keys and translated text as values
+        """
+        chain = self._build_chain()
+
+        result = await chain.ainvoke(self._chain_input(original_text, target_languages))
+
         logger.info(f"Result: {result}")
 
         return result
+
+    def _build_chain(self):
+        return _translation_chain(os.getpid(), self.model_name, settings.openai_api_base)
+
+    @staticmethod
+    def _chain_input(original_text: str, target_languages: list[str]) -> dict:
+        return {"original_text": original_text, "languages_str": ", ".join(target_languages)}
+
+
+@lru_cache(maxsize=None)
+def _translation_chain(pid: int, model_name: str, base_url):
+    """Chain of a pooled client, runnables hold no per call state so threads and coroutines share it"""
+    parser = JsonOutputParser(pydantic_object=TranslationResult)
+    return multi_translate_prompt | get_chat_model(model_name) | parser
@@ -0,0 +1,153 @@
+"""
+Partition maintenance service for the translation_tasks table
+"""
+
+import gzip
+import json
+import os
+import re
+from datetime import date
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.models.base import sync_engine
+from src.models.translation_model import TranslationTaskSubmission
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Monthly partitions are named translation_tasks_pYYYYMM by create_translation_tasks_partition
+PARTITION_NAME_PATTERN = re.compile(r"^translation_tasks_p(\d{4})(\d{2})$")
+# Longest wait for the lock of translation_tasks when detaching, the next run retries
+DETACH_LOCK_TIMEOUT = "5s"
+
+
+class PartitionService:
+    """Service for creating, archiving and dropping translation_tasks partitions"""
+
+    @staticmethod
+    def ensure_partitions(db: Session, months_ahead: int) -> List[str]:
+        """
+        Create the partitions of the current month and the next months_ahead months
+        
+        Args:
+            db: Sync database session
+            months_ahead: Number of future monthly partitions to create
+            
+        Returns:
+            List of partition names, existing partitions are left untouched
+        """
+        current_month = date.today().replace(day=1)
+        names = []
+        for i in range(months_ahead + 1):
+            name = db.execute(
+                text("SELECT create_translation_tasks_partition(:month_start)"),
+                {"month_start": _add_months(current_month, i)},
+            ).scalar()
+            names.append(name)
+        db.commit()
+        return names
+
+    @staticmethod
+    def list_partitions(db: Session) -> List[Tuple[str, date]]:
+        """
+        List the monthly partitions attached to translation_tasks
+        
+        Returns:
+            List of (partition name, first day of the month) sorted by month, the default partition is excluded
+        """
+        rows = db.execute(text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+            JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+            WHERE parent.relname = 'translation_tasks'
+            """
+        )).scalars().all()
+        db.commit()
+
+        partitions = []
+        for name in rows:
+            match = PARTITION_NAME_PATTERN.match(name)
+            if match:
+                partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    @staticmethod
+    def expired_partitions(db: Session, retention_months: int) -> List[str]:
+        """List the partitions whose whole month is older than the retention window"""
+        cutoff = _add_months(date.today().replace(day=1), -retention_months)
+        return [name for name, month in PartitionService.list_partitions(db) if month < cutoff]
+
+    @staticmethod
+    def purge_expired_submissions(db: Session, retention_months: int) -> int:
+        """
+        Delete deduplication ledger entries of tasks older than the retention window
+        
+        Returns:
+            int: Number of deleted entries
+        """
+        cutoff = _add_months(date.today().replace(day=1), -retention_months)
+        deleted = db.query(TranslationTaskSubmission).filter(
+            TranslationTaskSubmission.created_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    @staticmethod
+    def archive_partition(name: str, archive_dir: str) -> str:
+        """
+        Export every row of a partition to a gzip compressed NDJSON file
+        
+        Args:
+            name: Partition name
+            archive_dir: Directory of the archive files
+            
+        Returns:
+            str: Path of the archive file
+        """
+        _check_partition_name(name)
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_path = os.path.join(archive_dir, f"{name}.ndjson.gz")
+        temp_path = f"{archive_path}.tmp"
+
+        count = 0
+        with sync_engine.connect() as conn:
+            # Stream rows with a server side cursor to keep memory flat
+            result = conn.execution_options(stream_results=True).execute(text(f'SELECT * FROM "{name}"'))
+            with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+                for row in result.mappings():
+                    f.write(json.dumps(dict(row), ensure_ascii=False, default=str))
+                    f.write("\n")
+                    count += 1
+
+        # Only expose complete archives
+        os.replace(temp_path, archive_path)
+        logger.info(f"archived partition {name}: {count} rows to {archive_path}")
+        return archive_path
+
+    @staticmethod
+    def drop_partition(name: str) -> None:
+        """Detach and drop a partition in one short transaction"""
+        _check_partition_name(name)
+        # DETACH ... CONCURRENTLY is refused while translation_tasks has a default partition.
+        # The plain DETACH takes an exclusive lock, give up instead of queueing every query behind it.
+        with sync_engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+            conn.execute(text(f'ALTER TABLE translation_tasks DETACH PARTITION "{name}"'))
+            conn.execute(text(f'DROP TABLE "{name}"'))
+        logger.info(f"dropped partition {name}")
+
+
+def _check_partition_name(name: str) -> None:
+    """Partition names are interpolated into DDL, only accept monthly partition names"""
+    if not PARTITION_NAME_PATTERN.match(name):
+        raise ValueError(f"invalid partition name: {name}")
+
+
+def _add_months(month_start: date, months: int) -> date:
+    """Shift the first day of a month by a number of months"""
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
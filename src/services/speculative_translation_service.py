@@ -0,0 +1,118 @@
+"""
+Speculative translation overlapped with transcription
+
+Segments are fed in as the STT backend decodes them. Complete sentences are grouped into
+chunks and translated on a thread pool while later audio is still being decoded, the
+chunk translations are joined in order once transcription is done. Nothing is written
+anywhere until finish, so a failed similarity gate simply discards the chunks.
+"""
+
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List
+
+from src.configs.config import settings
+from src.services.cancellation_service import CancellationService
+from src.services.llm_translate_service import LLMTranslateService
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+# End of a sentence, with closing quotes or brackets
+SENTENCE_END = re.compile(r"[.!?。！？…]+[\"'”’)\]」』]*")
+# Languages written without spaces between sentences
+UNSPACED_LANGUAGES = {"zh-Hans", "zh-Hant", "ja"}
+
+
+@lru_cache(maxsize=None)
+def get_translation_executor() -> ThreadPoolExecutor:
+    """Process level pool running the chunk translations of all tasks"""
+    return ThreadPoolExecutor(max_workers=settings.speculative_max_workers,
+                              thread_name_prefix="speculative-translation")
+
+
+class SpeculativeTranslator:
+    """Translates the sentences of one task while it is being transcribed"""
+
+    def __init__(self, task_id: str, target_languages: List[str],
+                 chunk_chars: int = settings.speculative_chunk_chars):
+        self.task_id = task_id
+        self.target_languages = list(target_languages)
+        self.chunk_chars = chunk_chars
+        # Text after the last complete sentence
+        self._tail = ""
+        # Complete sentences not yet submitted
+        self._pending = ""
+        self._futures: List[Future] = []
+
+    def feed(self, segment: str) -> None:
+        """Add a decoded segment, submits a chunk once enough complete sentences are buffered"""
+        self._tail += segment
+        ends = list(SENTENCE_END.finditer(self._tail))
+        if not ends:
+            return
+        cut = ends[-1].end()
+        self._pending += self._tail[:cut]
+        self._tail = self._tail[cut:]
+        if len(self._pending) >= self.chunk_chars:
+            self._submit(self._pending)
+            self._pending = ""
+
+    def _submit(self, text: str) -> None:
+        text = text.strip()
+        if not text:
+            return
+        metrics.incr("speculative_chunks")
+        self._futures.append(get_translation_executor().submit(self._translate, text))
+
+    def _translate(self, text: str) -> Dict[str, str]:
+        CancellationService.check(self.task_id)
+        return LLMTranslateService().translate(text, self.target_languages)
+
+    def finish(self, languages: List[str]) -> Dict[str, str]:
+        """
+        Submit the rest of the transcript and join the chunk translations in order
+
+        Args:
+            languages: Target languages still needed, translations of the others are dropped
+
+        Returns:
+            Translations per language
+
+        Raises:
+            Exception: The first error of a chunk translation, the rest are discarded
+            KeyError: If a chunk came back without one of the languages
+        """
+        self._submit(self._pending + self._tail)
+        self._pending = self._tail = ""
+        try:
+            chunks = [future.result() for future in self._futures]
+        except BaseException:
+            self.discard()
+            raise
+        self._futures = []
+        if not chunks:
+            return {}
+
+        translations = {}
+        for language in languages:
+            missing = sum(language not in chunk for chunk in chunks)
+            if missing:
+                # A gap in the text is worse than the full LLM call the caller falls back to
+                metrics.incr("speculative_chunks_incomplete", missing)
+                raise KeyError(f"{missing} of {len(chunks)} speculative chunks have no {language} translation")
+            separator = "" if language in UNSPACED_LANGUAGES else " "
+            translations[language] = separator.join(chunk[language] for chunk in chunks).strip()
+        return translations
+
+    def discard(self) -> None:
+        """Drop everything translated so far, chunks not started yet are not sent"""
+        for future in self._futures:
+            future.cancel()
+        if self._futures:
+            metrics.incr("speculative_chunks_discarded", len(self._futures))
+            logger.info(f"Discarded {len(self._futures)} speculative translations of {self.task_id}")
+        self._futures = []
+        self._pending = self._tail = ""
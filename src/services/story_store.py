@@ -0,0 +1,304 @@
+"""
+Story store, serves stories.bin shards with hot reload
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+from fastapi import HTTPException
+
+from src.configs.config import settings
+from src.services.delta_segment import delta_path
+from src.services.file_decoding_service import FileDecodingService
+from src.services.trigram_index import trigram_index_path
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class StoryShard:
+    """A memory mapped shard file, released once retired and no lookup uses it anymore"""
+
+    def __init__(self, name: str, path: str, version: str, sidecars: Tuple = ()):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.sidecars = sidecars
+        self.reader = FileDecodingService(path)
+        self.languages = self.reader.languages()
+        self._lock = threading.Lock()
+        self._refs = 0
+        self._retired = False
+        self._closed = False
+
+    def acquire(self) -> bool:
+        """Pin the shard for a lookup, False if it was already released"""
+        with self._lock:
+            if self._closed:
+                return False
+            self._refs += 1
+            return True
+
+    def release(self) -> None:
+        """Unpin the shard, closing it if it was retired meanwhile"""
+        with self._lock:
+            self._refs -= 1
+            self._close_if_idle()
+
+    def retire(self) -> None:
+        """Mark the shard as replaced, it is closed when its last lookup ends"""
+        with self._lock:
+            self._retired = True
+            self._close_if_idle()
+
+    def _close_if_idle(self) -> None:
+        if self._retired and self._refs == 0 and not self._closed:
+            self._closed = True
+            self.reader.close()
+            logger.info(f"released shard {self.name} version {self.version}")
+
+
+class _Snapshot:
+    """Immutable set of shards, replaced as a whole on reload"""
+
+    def __init__(self, shards: Dict[str, StoryShard]):
+        self.shards = shards
+        self.by_language: Dict[str, StoryShard] = {}
+        for shard in shards.values():
+            for language in shard.languages:
+                if language in self.by_language:
+                    logger.warning(
+                        f"language {language} is in shards {self.by_language[language].name} and {shard.name}, "
+                        f"using {shard.name}")
+                self.by_language[language] = shard
+
+
+class StoryStore:
+    """
+    Serve texts from one or more stories.bin shards listed in a manifest
+    
+    A watcher thread polls the manifest and the shard files. New versions are loaded
+    next to the current ones and swapped in with a single reference assignment, so
+    lookups never see a partial state. Replaced shards stay mapped until their
+    in-flight lookups finish. Shard files must be replaced atomically (write then rename).
+    
+    Manifest format:
+        {"shards": [{"name": "en", "path": "en.bin", "version": "2025-08-01"}]}
+    Relative paths are resolved against the manifest directory, a missing version is
+    derived from the file modification time and size.
+    """
+
+    def __init__(self, manifest_path: Optional[str] = None, file_path: str = "stories.bin",
+                 reload_interval: float = 5.0):
+        self.manifest_path = manifest_path
+        self.file_path = file_path
+        self.reload_interval = reload_interval
+        self._snapshot = _Snapshot({})
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Why the shards could not be loaded, story lookups fail with 503 while it is set
+        self._load_error: Optional[str] = None
+        try:
+            self.reload()
+        except Exception as e:
+            # Keep the API up, the watcher retries and the other routes do not need the shards
+            self._load_error = str(e)
+            logger.error(f"failed to load stories: {e}")
+
+    def _read_manifest(self) -> List[Dict[str, str]]:
+        """List the shard entries with their resolved path and version"""
+        if self.manifest_path is None:
+            entries = [{"name": os.path.basename(self.file_path), "path": self.file_path}]
+        else:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(self.manifest_path))
+            entries = []
+            for entry in manifest["shards"]:
+                path = os.path.join(base_dir, entry["path"])
+                entries.append({"name": entry.get("name", entry["path"]), "path": path, "version": entry.get("version")})
+
+        for entry in entries:
+            if not entry.get("version"):
+                stat = os.stat(entry["path"])
+                entry["version"] = f"{stat.st_mtime_ns}-{stat.st_size}"
+            # Delta appends and index rebuilds reload the shard without a new version
+            entry["sidecars"] = tuple(
+                f"{os.stat(path).st_mtime_ns}-{os.path.getsize(path)}" if os.path.exists(path) else None
+                for path in (delta_path(entry["path"]), trigram_index_path(entry["path"]))
+            )
+        return entries
+
+    def reload(self) -> bool:
+        """
+        Load the shards whose version changed and swap them in
+        
+        Returns:
+            bool: True if a new set of shards was swapped in
+        """
+        with self._reload_lock:
+            entries = self._read_manifest()
+            signature = tuple((entry["name"], entry["path"], entry["version"], entry["sidecars"]) for entry in entries)
+            if signature == self._signature:
+                return False
+
+            current = self._snapshot
+            shards: Dict[str, StoryShard] = {}
+            loaded: List[StoryShard] = []
+            try:
+                for entry in entries:
+                    shard = current.shards.get(entry["name"])
+                    if shard is None or (shard.path, shard.version, shard.sidecars) != (
+                            entry["path"], entry["version"], entry["sidecars"]):
+                        shard = StoryShard(entry["name"], entry["path"], entry["version"], entry["sidecars"])
+                        loaded.append(shard)
+                    shards[entry["name"]] = shard
+            except Exception:
+                for shard in loaded:
+                    shard.retire()
+                raise
+
+            # Atomic swap, lookups started before keep using the previous snapshot
+            self._snapshot = _Snapshot(shards)
+            self._signature = signature
+            self._load_error = None
+
+        for name, shard in current.shards.items():
+            if shards.get(name) is not shard:
+                shard.retire()
+        for shard in loaded:
+            logger.info(f"loaded shard {shard.name} version {shard.version}: languages={shard.languages}")
+        return True
+
+    def start_watching(self) -> None:
+        """Start the background thread checking for new versions"""
+        if self.reload_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="story-store-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watching(self) -> None:
+        """Stop the background thread"""
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the current versions
+                logger.error(f"failed to reload stories: {e}")
+
+    def ensure_available(self) -> None:
+        """
+        Raise if the shards never loaded
+
+        Raises:
+            HTTPException: 503 until the watcher loads the shards
+        """
+        if self._load_error is not None:
+            raise HTTPException(status_code=503, detail=f"stories unavailable: {self._load_error}")
+
+    def versions(self) -> Dict[str, str]:
+        """Current version of every shard"""
+        return {name: shard.version for name, shard in self._snapshot.shards.items()}
+
+    @contextmanager
+    def _pin_all(self) -> Iterator[List[FileDecodingService]]:
+        """Pin every shard of the current snapshot"""
+        self.ensure_available()
+        while True:
+            shards = list(self._snapshot.shards.values())
+            pinned = []
+            for shard in shards:
+                if not shard.acquire():
+                    break
+                pinned.append(shard)
+            if len(pinned) == len(shards):
+                break
+            # A shard was retired meanwhile, retry with the new snapshot
+            for shard in pinned:
+                shard.release()
+        try:
+            yield [shard.reader for shard in pinned]
+        finally:
+            for shard in pinned:
+                shard.release()
+
+    @contextmanager
+    def _pin(self, language: str) -> Iterator[Optional[FileDecodingService]]:
+        """Pin the shard serving a language for the duration of a lookup, None if no shard has it"""
+        self.ensure_available()
+        while True:
+            shard = self._snapshot.by_language.get(language)
+            if shard is None:
+                yield None
+                return
+            # A shard retired between the snapshot read and the acquire is already closed, retry
+            if shard.acquire():
+                break
+        try:
+            yield shard.reader
+        finally:
+            shard.release()
+
+    def get_text(self, language: str, text_id: str, source: Optional[str] = None) -> str:
+        """Get text content by language, text_id and source"""
+        with self._pin(language) as reader:
+            if reader is None:
+                logger.error(f"not found: language {language}, text id {text_id}")
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"not found: language {language}, text id {text_id}"
+                )
+            return reader.get_text(language, text_id, source)
+
+    def iter_language(self, language: str, text_id_prefix: str = "") -> Iterator[Dict[str, str]]:
+        """Iterate the texts of a language in text_id order, optionally restricted to a text_id prefix"""
+        with self._pin(language) as reader:
+            if reader is not None:
+                yield from reader.iter_language(language, text_id_prefix)
+
+    def iter_text_id(self, text_id: str) -> Iterator[Dict[str, str]]:
+        """Iterate the texts of a text_id across all languages of all shards"""
+        for language in sorted(self._snapshot.by_language):
+            with self._pin(language) as reader:
+                if reader is None:
+                    continue
+                for record in reader.iter_text_id(text_id):
+                    if record["language"] == language:
+                        yield record
+
+    def search(self, query: str, language: Optional[str] = None, limit: int = 20) -> List[Dict[str, str]]:
+        """Find texts containing a phrase across shards, case insensitive"""
+        if language is not None:
+            with self._pin(language) as reader:
+                return reader.search(query, language, limit) if reader is not None else []
+
+        results = []
+        with self._pin_all() as readers:
+            for reader in readers:
+                results.extend(reader.search(query, None, limit - len(results)))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def find_similar(self, text: str, language: str, top: int = 5) -> List[Dict[str, str]]:
+        """Texts of a language sharing the most trigrams with a text, best first"""
+        with self._pin(language) as reader:
+            return reader.find_similar(text, language, top) if reader is not None else []
+
+@lru_cache(maxsize=None)
+def get_story_store() -> StoryStore:
+    """Get the process level story store"""
+    return StoryStore(
+        manifest_path=settings.stories_manifest,
+        file_path=settings.stories_file,
+        reload_interval=settings.stories_reload_interval,
+    )
@@ -0,0 +1,335 @@
+"""
+Speech-to-text service with pluggable backends
+"""
+
+import queue
+import threading
+from abc import ABC, abstractmethod
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from src.configs.config import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Path of an audio file, or 16 kHz mono float32 samples decoded by AudioPreprocessingService
+AudioInput = Union[str, Any]
+
+
+class STTBackend(ABC):
+    """Speech-to-text backend interface"""
+
+    name = ""
+
+    @abstractmethod
+    def transcribe(self, audio: AudioInput, should_stop: Optional[Callable[[], None]] = None,
+                   on_segment: Optional[Callable[[str], None]] = None) -> Dict[str, str]:
+        """
+        Transcribe an audio file
+        
+        Args:
+            audio: Path of the audio file or decoded samples
+            should_stop: Optional check called between decoded windows / segments,
+                raises to abandon the transcription
+            on_segment: Optional callback receiving the text of each segment as soon as it
+                is decoded, backends that cannot stream call it once with the whole text
+            
+        Returns:
+            Dictionary with the transcribed "text" and the detected "language"
+        """
+
+    def transcribe_batch(self, audios: List[AudioInput]) -> List[Union[Dict[str, str], Exception]]:
+        """
+        Transcribe several audio files, backends that can decode a batch at once override this
+        
+        Args:
+            audios: Paths of the audio files or decoded samples
+            
+        Returns:
+            One transcription dictionary per audio file, or the exception its transcription raised,
+            in order, so one bad file does not fail the others
+        """
+        results = []
+        for audio in audios:
+            try:
+                results.append(self.transcribe(audio))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class WhisperBackend(STTBackend):
+    """Reference openai-whisper PyTorch implementation"""
+
+    name = "whisper"
+
+    def __init__(self, model_name: str, cpu_threads: int = 0):
+        import torch
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        if cpu_threads > 0:
+            torch.set_num_threads(cpu_threads)
+        self.model = whisper.load_model(model_name)
+        self._tokenizer = get_tokenizer(self.model.is_multilingual, num_languages=self.model.num_languages)
+        # transcribe decodes one 30 second window per model.decode call, the wrapper runs
+        # the stop check of the calling thread before each window and keeps its result
+        self._local = threading.local()
+        decode = self.model.decode
+
+        def checked_decode(mel, *args, **kwargs):
+            local = self._local
+            should_stop = getattr(local, "should_stop", None)
+            if should_stop:
+                should_stop()
+            result = decode(mel, *args, **kwargs)
+            if getattr(local, "on_segment", None) and not isinstance(result, list):
+                # Temperature fallback decodes the same window tensor again, the last result wins
+                if mel is not local.window:
+                    self._emit_window()
+                local.window, local.window_result = mel, result
+            return result
+
+        self.model.decode = checked_decode
+
+    def _emit_window(self) -> None:
+        """
+        Pass the text transcribe keeps of the last decoded window to on_segment
+
+        Mirrors whisper.transcribe.transcribe of openai-whisper 20250625, the version in uv.lock:
+        its no_speech_threshold / logprob_threshold defaults (0.6 / -1.0) in the should_skip check,
+        and the consecutive timestamp slicing that drops the unfinished last segment of a window.
+        Check both when upgrading openai-whisper.
+        """
+        local = self._local
+        result, local.window_result = local.window_result, None
+        if result is None:
+            return
+        # Same thresholds as the transcribe defaults, the window is skipped as silence
+        if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0:
+            return
+        tokens = result.tokens
+        is_timestamp = [token >= self._tokenizer.timestamp_begin for token in tokens]
+        consecutive = [i for i in range(1, len(tokens)) if is_timestamp[i - 1] and is_timestamp[i]]
+        if consecutive and is_timestamp[-2:] != [False, True]:
+            # transcribe drops the unfinished segment after the last timestamp pair, the next window decodes it again
+            tokens = tokens[:consecutive[-1]]
+        text = self._tokenizer.decode(tokens)
+        if text:
+            local.on_segment(text)
+
+    def transcribe(self, audio: AudioInput, should_stop: Optional[Callable[[], None]] = None,
+                   on_segment: Optional[Callable[[str], None]] = None) -> Dict[str, str]:
+        local = self._local
+        local.should_stop, local.on_segment = should_stop, on_segment
+        local.window = local.window_result = None
+        try:
+            result = self.model.transcribe(audio)
+            if on_segment:
+                self._emit_window()
+        finally:
+            local.should_stop = local.on_segment = None
+            local.window = local.window_result = None
+        return {"text": result["text"], "language": result["language"]}
+
+    def transcribe_batch(self, audios: List[AudioInput]) -> List[Union[Dict[str, str], Exception]]:
+        """
+        Decode clips that fit in one 30 second window as a single batch,
+        longer clips and clips failing the quality checks go through transcribe.
+        Errors stay with their clip, a failing batch decode falls back to one clip at a time.
+        """
+        import whisper
+
+        arrays = [None] * len(audios)
+        results: List[Union[Dict[str, str], Exception]] = [None] * len(audios)
+        for i, audio in enumerate(audios):
+            try:
+                arrays[i] = whisper.load_audio(audio) if isinstance(audio, str) else audio
+            except Exception as e:
+                results[i] = e
+        short = [i for i, array in enumerate(arrays)
+                 if results[i] is None and len(array) <= whisper.audio.N_SAMPLES]
+
+        try:
+            results = self._decode_short(arrays, short, results)
+        except Exception as e:
+            # Out of memory or one bad clip, transcribe below isolates the clips
+            logger.warning(f"batched decode of {len(short)} clips failed, decoding them one by one: {e}")
+
+        for i, array in enumerate(arrays):
+            if results[i] is None:
+                try:
+                    result = self.model.transcribe(array)
+                    results[i] = {"text": result["text"], "language": result["language"]}
+                except Exception as e:
+                    results[i] = e
+        return results
+
+    def _decode_short(self, arrays: List[Any], short: List[int],
+                      results: List[Union[Dict[str, str], Exception]]) -> List[Union[Dict[str, str], Exception]]:
+        """Results with the short clips decoded as one batch, clips failing the quality checks stay None"""
+        import torch
+        import whisper
+
+        results = list(results)
+        if len(short) > 1:
+            # Pad every clip to the 30 second window and stack their mel spectrograms
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(arrays[i]), self.model.dims.n_mels)
+                for i in short
+            ]).to(self.model.device)
+            # Language is detected per clip when it is not set
+            options = whisper.DecodingOptions(
+                task="transcribe",
+                without_timestamps=True,
+                fp16=self.model.device.type == "cuda",
+            )
+            for i, decoded in zip(short, whisper.decode(self.model, mel, options)):
+                if decoded.no_speech_prob > 0.6 and decoded.avg_logprob < -1.0:
+                    results[i] = {"text": "", "language": decoded.language}
+                elif decoded.compression_ratio <= 2.4 and decoded.avg_logprob >= -1.0:
+                    results[i] = {"text": decoded.text, "language": decoded.language}
+                # Otherwise leave it to transcribe, which retries with temperature fallback
+        return results
+
+
+class FasterWhisperBackend(STTBackend):
+    """CTranslate2 based faster-whisper implementation, quantized inference on CPU"""
+
+    name = "faster_whisper"
+
+    def __init__(self, model_name: str, compute_type: str = "int8", cpu_threads: int = 0, num_workers: int = 1):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(
+            model_name,
+            device="cpu",
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
+        )
+
+    def transcribe(self, audio: AudioInput, should_stop: Optional[Callable[[], None]] = None,
+                   on_segment: Optional[Callable[[str], None]] = None) -> Dict[str, str]:
+        # Greedy decoding, like the openai-whisper transcribe default
+        segments, info = self.model.transcribe(audio, beam_size=1)
+        # Segments are decoded lazily while iterating
+        texts = []
+        for segment in segments:
+            if should_stop:
+                should_stop()
+            texts.append(segment.text)
+            if on_segment:
+                on_segment(segment.text)
+        return {"text": "".join(texts), "language": info.language}
+
+
+def create_stt_backend(name: str) -> STTBackend:
+    """Create a backend by name with the configured model and CPU settings"""
+    if name == WhisperBackend.name:
+        return WhisperBackend(settings.whisper_model, cpu_threads=settings.stt_cpu_threads)
+    if name == FasterWhisperBackend.name:
+        return FasterWhisperBackend(
+            settings.whisper_model,
+            compute_type=settings.stt_compute_type,
+            cpu_threads=settings.stt_cpu_threads,
+            num_workers=settings.stt_num_workers,
+        )
+    raise ValueError(f"unsupported STT backend: {name}")
+
+
+@lru_cache(maxsize=None)
+def get_stt_backend() -> STTBackend:
+    """Get the configured backend, the model is loaded once per process"""
+    backend = create_stt_backend(settings.stt_backend)
+    logger.info(f"loaded STT backend {backend.name} with model {settings.whisper_model}")
+    return backend
+
+
+class TranscriptionBatcher:
+    """
+    Collect transcription requests from concurrent tasks of one worker process
+    and run them through the backend as batches
+    
+    A batch is dispatched once batch_size requests are waiting or max_wait seconds
+    after its first request arrived, whichever comes first.
+    """
+
+    def __init__(self, backend: STTBackend, batch_size: int, max_wait: float):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._requests: "queue.Queue[Tuple[AudioInput, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="stt-batcher", daemon=True)
+        self._thread.start()
+
+    def transcribe(self, audio: AudioInput) -> Dict[str, str]:
+        """Queue an audio file and block until its batch is decoded"""
+        future: Future = Future()
+        self._requests.put((audio, future))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[AudioInput, Future]]:
+        """Block for the first request, then wait up to max_wait to fill the batch"""
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                results = self.backend.transcribe_batch([audio for audio, _ in batch])
+            except Exception as e:
+                # Backends report clip errors per item, this is a bug of the backend itself
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            logger.info(f"transcribed batch of {len(batch)} in {time.perf_counter() - start:.2f}s")
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+@lru_cache(maxsize=None)
+def get_transcription_batcher() -> TranscriptionBatcher:
+    """Get the process level batcher of the configured backend"""
+    return TranscriptionBatcher(
+        get_stt_backend(),
+        batch_size=settings.stt_batch_size,
+        max_wait=settings.stt_batch_max_wait_ms / 1000,
+    )
+
+
+def transcribe(audio: AudioInput, should_stop: Optional[Callable[[], None]] = None,
+               on_segment: Optional[Callable[[str], None]] = None) -> Dict[str, str]:
+    """
+    Transcribe an audio file with the configured backend,
+    batched with concurrent tasks of this process when STT_BATCH_SIZE > 1
+    
+    should_stop is checked between windows, a batch is shared with other tasks
+    so batched transcriptions only check it before they are queued and report
+    the whole text to on_segment at the end.
+    """
+    if settings.stt_batch_size > 1:
+        if should_stop:
+            should_stop()
+        result = get_transcription_batcher().transcribe(audio)
+        if on_segment:
+            on_segment(result["text"])
+        return result
+    return get_stt_backend().transcribe(audio, should_stop, on_segment)
@@ -0,0 +1,247 @@
+"""
+Task state repository for the workers
+
+Every status transition is a single guarded UPDATE ... WHERE status IN (...) RETURNING
+statement run in autocommit, so it costs one round trip and a late worker cannot
+overwrite a task that was cancelled or finished in the meantime.
+
+A worker holds a lease on the rows it processes: start takes it, heartbeat extends it
+and the writes that follow only apply while this worker still owns it, so a worker
+whose lease expired and whose task was re-queued cannot overwrite the new attempt.
+"""
+
+import os
+import socket
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Row, bindparam, or_, update
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from src.configs.config import settings
+from src.models.base import engine, sync_engine
+from src.models.translation_model import TranslationTask, TaskStatus, LIVE_STATUSES
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Errors of an unreachable or restarting database, worth retrying the statement later
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError, OSError)
+
+# Single statement transitions do not need a transaction
+_sync_autocommit_engine = sync_engine.execution_options(isolation_level="AUTOCOMMIT")
+_async_autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
+# Columns a worker needs to run or resume a task
+TASK_INPUT_COLUMNS = (
+    TranslationTask.task_id,
+    TranslationTask.audio_url,
+    TranslationTask.original_text,
+    TranslationTask.target_languages,
+    TranslationTask.stt_result,
+    TranslationTask.translation_results,
+    TranslationTask.checkpoint,
+)
+
+
+def worker_id() -> str:
+    """Lease owner name of this process, computed per call as prefork children share the parent's globals"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _lease_expiry(extra_seconds: float = 0) -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.task_lease_seconds + extra_seconds)
+
+
+def _transition(task_id: str, from_statuses: Iterable[str], values: Dict[str, Any], returning=None,
+                owned: bool = True):
+    statement = (
+        update(TranslationTask)
+        .where(TranslationTask.task_id == task_id, TranslationTask.status.in_(list(from_statuses)))
+        .values(updated_at=datetime.now(timezone.utc), **values)
+    )
+    if owned:
+        statement = statement.where(TranslationTask.lease_owner == worker_id())
+    return statement.returning(*(returning or (TranslationTask.task_id,)))
+
+
+def _start_statement(task_id: str):
+    values = {
+        "status": TaskStatus.PROCESSING.value,
+        "error_message": None,
+        "lease_owner": worker_id(),
+        "lease_expires_at": _lease_expiry(),
+    }
+    # Processing tasks only once their lease was released or expired, a redelivered message must not steal a live lease
+    takeable = or_(
+        TranslationTask.status == TaskStatus.PENDING.value,
+        TranslationTask.lease_owner.is_(None),
+        TranslationTask.lease_expires_at < datetime.now(timezone.utc),
+    )
+    return _transition(task_id, LIVE_STATUSES, values, returning=TASK_INPUT_COLUMNS, owned=False).where(takeable)
+
+
+def _release_statement(task_id: str, countdown: float, values: Dict[str, Any]):
+    """Give up the lease until the retry, the reaper only steps in if the retry never comes"""
+    values = {**values, "lease_owner": None, "lease_expires_at": _lease_expiry(countdown)}
+    return _transition(task_id, [TaskStatus.PROCESSING.value], values)
+
+
+def _heartbeat_statement(task_ids: List[str]):
+    return (
+        update(TranslationTask)
+        .where(
+            TranslationTask.task_id.in_(task_ids),
+            TranslationTask.status == TaskStatus.PROCESSING.value,
+            TranslationTask.lease_owner == worker_id(),
+        )
+        # Heartbeats are not updates of the task, keep updated_at as it is. The updated_at
+        # trigger skips updates that change nothing but lease_expires_at, see db/init.sql
+        .values(lease_expires_at=_lease_expiry(), updated_at=TranslationTask.updated_at)
+    )
+
+
+# Final transitions drop the lease
+_LEASE_CLEARED = {"lease_owner": None, "lease_expires_at": None}
+
+
+def _progress_statement(columns: Iterable[str]):
+    """Executemany update of progress columns, only while the task is processing"""
+    return (
+        update(TranslationTask)
+        .where(
+            TranslationTask.task_id == bindparam("b_task_id"),
+            TranslationTask.status == TaskStatus.PROCESSING.value,
+            TranslationTask.lease_owner == worker_id(),
+        )
+        .values(updated_at=bindparam("b_updated_at"), **{column: bindparam(f"b_{column}") for column in columns})
+    )
+
+
+class _ProgressBuffer:
+    """Non critical column updates waiting for the next transition or flush"""
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, Any]] = defaultdict(dict)
+
+    def record(self, task_id: str, values: Dict[str, Any]) -> None:
+        self._pending[task_id].update(values)
+
+    def take(self, task_id: str) -> Dict[str, Any]:
+        return self._pending.pop(task_id, {})
+
+    def drain(self) -> List[tuple]:
+        """Group pending updates by column set, one executemany per group"""
+        pending, self._pending = self._pending, defaultdict(dict)
+        groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        now = datetime.now(timezone.utc)
+        for task_id, values in pending.items():
+            params = {f"b_{column}": value for column, value in values.items()}
+            groups[tuple(sorted(values))].append({"b_task_id": task_id, "b_updated_at": now, **params})
+        return list(groups.items())
+
+
+class TaskStateRepository:
+    """Status transitions of translation tasks for the Celery worker"""
+
+    def __init__(self):
+        self._progress = _ProgressBuffer()
+
+    def _execute(self, statement) -> Optional[Row]:
+        with _sync_autocommit_engine.connect() as connection:
+            return connection.execute(statement).first()
+
+    def start(self, task_id: str) -> Optional[Row]:
+        """
+        Move a pending (or retried) task to processing and take its lease
+
+        Returns:
+            Row with TASK_INPUT_COLUMNS, None if the task does not exist or is no longer runnable
+        """
+        return self._execute(_start_statement(task_id))
+
+    def record_progress(self, task_id: str, **values: Any) -> None:
+        """Buffer a non critical update, it is written with the next transition"""
+        self._progress.record(task_id, values)
+
+    def save_checkpoint(self, task_id: str, **values: Any) -> bool:
+        """Write stage outputs (and buffered progress) now, False if the task left processing"""
+        values = {**self._progress.take(task_id), **values}
+        return self._execute(_transition(task_id, [TaskStatus.PROCESSING.value], values)) is not None
+
+    def release_for_retry(self, task_id: str, countdown: float, **values: Any) -> bool:
+        """Write the checkpoint and give up the lease until the retry countdown has passed"""
+        values = {**self._progress.take(task_id), **values}
+        return self._execute(_release_statement(task_id, countdown, values)) is not None
+
+    def heartbeat(self, task_ids: List[str]) -> None:
+        """Extend the leases of the tasks this process is running"""
+        with _sync_autocommit_engine.connect() as connection:
+            connection.execute(_heartbeat_statement(task_ids))
+
+    def complete(self, task_id: str, **values: Any) -> bool:
+        """Mark a processing task completed, False if it was cancelled or failed meanwhile"""
+        values = {**self._progress.take(task_id), **values, "status": TaskStatus.COMPLETED.value, **_LEASE_CLEARED}
+        return self._execute(_transition(task_id, [TaskStatus.PROCESSING.value], values)) is not None
+
+    def fail(self, task_id: str, error_message: str) -> bool:
+        """Mark a live task failed, False if it already reached a final status"""
+        values = {**self._progress.take(task_id), "status": TaskStatus.FAILED.value,
+                  "error_message": error_message, **_LEASE_CLEARED}
+        return self._execute(_transition(task_id, LIVE_STATUSES, values)) is not None
+
+
+class AsyncTaskStateRepository:
+    """Status transitions of translation tasks for the async worker"""
+
+    def __init__(self):
+        self._progress = _ProgressBuffer()
+
+    async def _execute(self, statement) -> Optional[Row]:
+        async with _async_autocommit_engine.connect() as connection:
+            return (await connection.execute(statement)).first()
+
+    async def start(self, task_id: str) -> Optional[Row]:
+        """See TaskStateRepository.start"""
+        return await self._execute(_start_statement(task_id))
+
+    def record_progress(self, task_id: str, **values: Any) -> None:
+        """Buffer a non critical update, it is written by flush_progress or the next transition"""
+        self._progress.record(task_id, values)
+
+    async def flush_progress(self) -> int:
+        """Write the buffered updates of all tasks, one executemany per column set"""
+        groups = self._progress.drain()
+        if not groups:
+            return 0
+        async with _async_autocommit_engine.connect() as connection:
+            for columns, params in groups:
+                await connection.execute(_progress_statement(columns), params)
+        return sum(len(params) for _, params in groups)
+
+    async def save_checkpoint(self, task_id: str, **values: Any) -> bool:
+        """See TaskStateRepository.save_checkpoint"""
+        values = {**self._progress.take(task_id), **values}
+        return await self._execute(_transition(task_id, [TaskStatus.PROCESSING.value], values)) is not None
+
+    async def release_for_retry(self, task_id: str, countdown: float, **values: Any) -> bool:
+        """See TaskStateRepository.release_for_retry"""
+        values = {**self._progress.take(task_id), **values}
+        return await self._execute(_release_statement(task_id, countdown, values)) is not None
+
+    async def heartbeat(self, task_ids: List[str]) -> None:
+        """See TaskStateRepository.heartbeat"""
+        async with _async_autocommit_engine.connect() as connection:
+            await connection.execute(_heartbeat_statement(task_ids))
+
+    async def complete(self, task_id: str, **values: Any) -> bool:
+        """See TaskStateRepository.complete"""
+        values = {**self._progress.take(task_id), **values, "status": TaskStatus.COMPLETED.value, **_LEASE_CLEARED}
+        return await self._execute(_transition(task_id, [TaskStatus.PROCESSING.value], values)) is not None
+
+    async def fail(self, task_id: str, error_message: str) -> bool:
+        """See TaskStateRepository.fail"""
+        values = {**self._progress.take(task_id), "status": TaskStatus.FAILED.value,
+                  "error_message": error_message, **_LEASE_CLEARED}
+        return await self._execute(_transition(task_id, LIVE_STATUSES, values)) is not None
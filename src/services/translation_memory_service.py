@@ -0,0 +1,67 @@
+"""
+Translation memory service, serves stored translations of known stories
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+
+from src.configs.config import settings
+from src.services.similarity_service import SimilarityService
+from src.services.story_store import get_story_store
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranslationMemoryService:
+    """Match transcripts against the stories corpus and reuse its translations"""
+
+    @staticmethod
+    def lookup(text: str, source_language: Optional[str],
+               target_languages: List[str]) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        """
+        Find the stored story matching a transcript and its translations
+        
+        Candidates come from the trigram index of the source language, the best one
+        must pass the SimilarityService check against the configured threshold.
+        
+        Args:
+            text: Transcribed text
+            source_language: Normalized source language
+            target_languages: Languages to look up
+            
+        Returns:
+            Tuple of the match ({"text_id", "similarity"}, None if no story matched)
+            and the stored translations found, keyed by language code
+        """
+        if not settings.translation_memory_enabled or source_language is None or not target_languages:
+            return None, {}
+
+        try:
+            store = get_story_store()
+            store.start_watching()
+            candidates = store.find_similar(text, source_language, settings.translation_memory_candidates)
+        except Exception as e:
+            logger.error(f"translation memory unavailable: {e}")
+            return None, {}
+
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = SimilarityService.calculate_similarity(candidate["content"], text)
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is None or best_similarity < settings.translation_memory_threshold:
+            return None, {}
+
+        translations = {}
+        for language in target_languages:
+            try:
+                translations[language] = store.get_text(language, best["text_id"])
+            except HTTPException:
+                # Not stored in this language, left to the LLM
+                continue
+
+        match = {"text_id": best["text_id"], "similarity": best_similarity}
+        logger.info(f"translation memory matched text {best['text_id']} ({best_similarity:.3f}), "
+                    f"stored languages: {list(translations.keys())}")
+        return match, translations
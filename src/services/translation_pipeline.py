@@ -0,0 +1,130 @@
+"""
+Translation pipeline steps shared by the Celery task and the async worker
+"""
+
+import random
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.services.language_service import LanguageService
+from src.services.similarity_service import SimilarityService
+from src.services.translation_memory_service import TranslationMemoryService
+from src.utils.logger import get_logger
+from src.utils import metrics
+
+logger = get_logger(__name__)
+
+# Minimum similarity between the original text and the STT result
+SIMILARITY_THRESHOLD = 0.8
+
+# Task stages in order, a retry resumes from the first incomplete one
+STAGE_DOWNLOAD = "download"
+STAGE_TRANSCRIBE = "transcribe"
+STAGE_TRANSLATE = "translate"
+# Audio ffmpeg could not decode, reported instead of the download stage it happens in
+STAGE_DECODE = "decode"
+
+
+class RetryPolicy(NamedTuple):
+    """Retry budget and backoff of a stage"""
+    max_retries: int
+    base_delay: float
+    max_delay: float
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, attempt counts from 0"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+RETRY_POLICIES = {
+    # Network errors, usually gone after a short wait
+    STAGE_DOWNLOAD: RetryPolicy(max_retries=5, base_delay=10, max_delay=300),
+    # Corrupt or unsupported audio, a retry downloads the same bytes
+    STAGE_DECODE: RetryPolicy(max_retries=0, base_delay=0, max_delay=0),
+    # Mostly deterministic (corrupt audio, out of memory), retry once
+    STAGE_TRANSCRIBE: RetryPolicy(max_retries=1, base_delay=30, max_delay=60),
+    # Rate limits and timeouts of the LLM API
+    STAGE_TRANSLATE: RetryPolicy(max_retries=5, base_delay=5, max_delay=300),
+}
+
+
+class TranslationPipeline:
+    """CPU light steps between transcription and LLM translation"""
+
+    @staticmethod
+    def build_stt_result(result: Dict[str, str],
+                         preprocessing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Prepare the STT result, with the detected language mapped onto our supported codes"""
+        stt_result = {
+            "text": result["text"],
+            "language": result["language"],
+            "normalized_language": LanguageService.normalize(result["language"], result["text"]),
+            "processed_at": datetime.now(timezone.utc).isoformat()
+        }
+        if preprocessing:
+            # Audio duration, seconds of silence removed and kept spans
+            stt_result["preprocessing"] = preprocessing
+        return stt_result
+
+    @staticmethod
+    def check_accuracy(original_text: Optional[str], text: str) -> Optional[str]:
+        """
+        Check the STT result against the original text
+        
+        Returns:
+            Error message if the STT result is not accurate, None otherwise
+        """
+        if not original_text:
+            return None
+        # Calculate the similarity between the original text and the STT result
+        similarity = SimilarityService.calculate_similarity(original_text, text)
+        if similarity < SIMILARITY_THRESHOLD:
+            return f"STT result is not accurate, similarity: {similarity}"
+        return None
+
+    @staticmethod
+    def plan_translations(stt_result: Dict[str, Any],
+                          target_languages: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Produce the translations that do not need the LLM
+        
+        Targets in the source language (or its other Chinese script) are handled locally and
+        known stories are served from the corpus. stt_result records what was skipped.
+        
+        Returns:
+            Tuple of the translations produced so far and the languages left to the LLM
+        """
+        text = stt_result["text"]
+        source_language = stt_result["normalized_language"]
+
+        translations = LanguageService.translate_locally(text, source_language, target_languages)
+        llm_languages = [language for language in target_languages if language not in translations]
+
+        memory_match, memory_translations = TranslationMemoryService.lookup(text, source_language, llm_languages)
+        if memory_match:
+            stt_result["translation_memory"] = {**memory_match, "languages": list(memory_translations.keys())}
+            translations.update(memory_translations)
+            llm_languages = [language for language in llm_languages if language not in memory_translations]
+            metrics.incr("translation_memory_hits")
+
+        stt_result["llm_languages_skipped"] = list(translations.keys())
+        metrics.incr("llm_languages_skipped", len(translations))
+        if not llm_languages:
+            metrics.incr("llm_calls_saved")
+        return translations, llm_languages
+
+    @staticmethod
+    def next_retry(checkpoint: Dict[str, Any], stage: str) -> Optional[float]:
+        """
+        Count a failed attempt of the stage in the checkpoint
+        
+        Returns:
+            Countdown of the retry in seconds, None once the stage is out of retries
+        """
+        attempts = checkpoint.setdefault("attempts", {})
+        attempt = attempts.get(stage, 0)
+        policy = RETRY_POLICIES[stage]
+        if attempt >= policy.max_retries:
+            return None
+        attempts[stage] = attempt + 1
+        return policy.delay(attempt)
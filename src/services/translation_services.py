@@ -2,18 +2,28 @@
 Translation service module for Multi Translate Service
 """
 
+import asyncio
+import base64
+import hashlib
+import json
 from datetime import datetime, timezone
 from fastapi import HTTPException
 import uuid
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from celery.result import AsyncResult
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import load_only
 
 from src.celery_app import celery_app
-from src.models.translation_model import TranslationTask, TaskStatus, validate_languages
+from src.models.base import async_session, is_replica, replica_lags
+from src.models.translation_model import (
+    TranslationTask, TranslationTaskSubmission, TaskStatus, LIVE_STATUSES, TASK_FIELDS, validate_languages
+)
 from src.schemas.translation_schemas import TranslationParams
+from src.services.cancellation_service import CancellationService
 from src.utils.logger import get_logger
+from src.utils import metrics
 from src.tasks.translation_tasks import stt_task
 
 
@@ -23,16 +33,21 @@ class TranslationService:
     """Service for handling translation tasks"""
     
     @staticmethod
-    async def create_task(db: AsyncSession, params: TranslationParams) -> Dict[str, Any]:
+    async def create_task(db: AsyncSession, params: TranslationParams,
+                          idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Create a new translation task
         
+        Identical submissions attach to the task already serving them while it is in
+        flight or completed, instead of creating a new one.
+        
         Args:
             db: Database session
             params: Translation parameters
+            idempotency_key: Optional client supplied idempotency key
             
         Returns:
-            Dictionary with task information
+            Dictionary with task information and whether the submission was deduplicated
         """
         # check target languages
         is_valid, error_message = validate_languages(params.target_languages)
@@ -46,6 +61,29 @@ class TranslationService:
         # Generate unique task ID
         task_id = str(uuid.uuid4())
 
+        payload_fingerprint = _payload_fingerprint(params)
+        fingerprint = (
+            hashlib.sha256(f"key:{idempotency_key}".encode("utf-8")).hexdigest()
+            if idempotency_key else payload_fingerprint
+        )
+
+        # Claim the fingerprint, a concurrent identical submission waits here until we commit
+        claimed = await db.execute(
+            pg_insert(TranslationTaskSubmission)
+            .values(
+                fingerprint=fingerprint,
+                payload_fingerprint=payload_fingerprint,
+                idempotency_key=idempotency_key,
+                task_id=task_id,
+            )
+            .on_conflict_do_nothing(index_elements=[TranslationTaskSubmission.fingerprint])
+            .returning(TranslationTaskSubmission.task_id)
+        )
+        if claimed.scalar_one_or_none() is None:
+            duplicate = await TranslationService._attach_submission(db, fingerprint, payload_fingerprint, task_id)
+            if duplicate is not None:
+                return duplicate
+
         # Create new translation task
         task = TranslationTask(
             task_id=task_id,
@@ -70,107 +108,269 @@ class TranslationService:
         logger.info(f"Created translation task: {task_id}")
         
         result = task.to_dict()
+        result["deduplicated"] = False
         return result
-    
+
     @staticmethod
-    async def get_task(db: AsyncSession, task_id: str) -> Dict[str, Any]:
-        """Get task status"""
+    async def _attach_submission(db: AsyncSession, fingerprint: str, payload_fingerprint: str,
+                                 new_task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Attach a duplicate submission to the task already serving its fingerprint
+        
+        Returns:
+            Dictionary with the existing task information, or None if the existing task
+            failed or was cancelled, in which case the fingerprint now points to new_task_id
+        """
         result = await db.execute(
-            select(TranslationTask).filter(TranslationTask.task_id == task_id)
+            select(TranslationTaskSubmission)
+            .filter(TranslationTaskSubmission.fingerprint == fingerprint)
+            .with_for_update()
+        )
+        submission = result.scalar_one()
+        if submission.payload_fingerprint != payload_fingerprint:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Idempotency key was already used with a different request")
+
+        result = await db.execute(
+            select(TranslationTask).filter(TranslationTask.task_id == submission.task_id)
         )
         task = result.scalar_one_or_none()
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-        
-        # Eagerly load all attributes to avoid lazy loading issues
-        await db.refresh(task)
-        # Check celery task status with task_id
-        celery_result = AsyncResult(task_id, app=celery_app)
 
-        logger.info(f"Task {task_id} Celery result state: {celery_result.state}")
+        if task is None or task.status not in LIVE_STATUSES + [TaskStatus.COMPLETED.value]:
+            # Nothing to attach to, serve the submission with a new task
+            submission.task_id = new_task_id
+            submission.duplicate_count = 0
+            return None
 
-        # Sync status 
-        needs_update = False
-        updated_status = task.status
-        error_message = task.error_message
-        
-        try:
-            if celery_result.state == 'FAILURE':
-                # Celery task failed
-                if task.status not in [TaskStatus.FAILED.value, TaskStatus.CANCELLED.value]:
-                    updated_status = TaskStatus.FAILED.value
-                    error_message = str(celery_result.info) if celery_result.info else "Task failed in Celery"
-                    needs_update = True
-                    logger.warning(f"Syncing failed task status for {task_id}: {error_message}")
-            
-            elif celery_result.state == 'SUCCESS':
-                # Celery task succeeded but DB might not be updated
-                if task.status not in [TaskStatus.COMPLETED.value]:
-                    updated_status = TaskStatus.COMPLETED.value
-                    needs_update = True
-                    logger.warning(f"Syncing completed task status for {task_id}")
-                    
-            elif celery_result.state == 'PENDING':
-                # Task not started or doesn't exist in Celery
-                if task.status == TaskStatus.PROCESSING.value:
-                    # Task was processing but Celery doesn't know about it
-                    updated_status = TaskStatus.FAILED.value
-                    error_message = "Task lost in Celery worker"
-                    needs_update = True
-                    logger.error(f"Task {task_id} lost in Celery, marking as failed")
-                    
-            elif celery_result.state == 'RETRY':
-                # Task is retrying
-                if task.status != TaskStatus.PROCESSING.value:
-                    updated_status = TaskStatus.PROCESSING.value
-                    needs_update = True
-                    
-            elif celery_result.state == 'REVOKED':
-                # Task was cancelled
-                if task.status != TaskStatus.CANCELLED.value:
-                    updated_status = TaskStatus.CANCELLED.value
-                    needs_update = True
-                    
-        except Exception as e:
-            logger.error(f"Error checking Celery status for task {task_id}: {e}")
+        submission.duplicate_count += 1
+        duplicate_count = submission.duplicate_count
+        await db.commit()
+        metrics.incr("submissions_deduplicated")
+        logger.info(
+            f"Deduplicated submission attached to task {task.task_id} ({task.status}), "
+            f"duplicates so far: {duplicate_count}")
 
-        
-        # Update database if needed
-        if needs_update:
-            try:
-                task.status = updated_status
-                if error_message and error_message != task.error_message:
-                    task.error_message = error_message
-                task.updated_at = datetime.now(timezone.utc)
-                await db.commit()
-                logger.info(f"Synchronized task {task_id} status to {updated_status}")
-            except Exception as e:
-                await db.rollback()
-                logger.error(f"Failed to sync task status for {task_id}: {e}")
-        
-        return task.to_dict()
+        result = task.to_dict()
+        result["deduplicated"] = True
+        result["duplicate_count"] = duplicate_count
+        return result
     
     @staticmethod
-    async def cancel_task(db: AsyncSession, task_id: str) -> Dict[str, Any]:
-        """Cancel task"""
-        result = await db.execute(
-            select(TranslationTask).filter(TranslationTask.task_id == task_id)
+    def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+        """
+        Parse a comma separated fields= projection
+        
+        Returns:
+            Selected fields in request order, None for all fields
+        """
+        if not fields:
+            return None
+        selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in selected if field not in TASK_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unsupported fields: {', '.join(unknown)}")
+        return selected or None
+
+    @staticmethod
+    def _load_fields(fields: Optional[List[str]]) -> list:
+        """Loader options deferring the columns outside the projection"""
+        if fields is None:
+            return []
+        # Identity and pagination columns, always small, status tells whether a replica row may be stale
+        columns = set(fields) | {"task_id", "created_at", "id", "status"}
+        return [load_only(*(getattr(TranslationTask, column) for column in columns))]
+
+    @staticmethod
+    async def get_task(db: AsyncSession, task_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Get task status, restricted to fields if given"""
+        query = (
+            select(TranslationTask)
+            .filter(TranslationTask.task_id == task_id)
+            .options(*TranslationService._load_fields(fields))
         )
-        task = result.scalar_one_or_none()
+        task = (await db.execute(query)).scalar_one_or_none()
+        # Missing: created after the replica's last replayed write. Live while the replica lags:
+        # it may have moved on already, pollers must not see it go back
+        if is_replica(db) and (not task or (task.status in LIVE_STATUSES and replica_lags(db))):
+            metrics.incr("db_replica_stale_fallbacks" if task else "db_replica_miss_fallbacks")
+            async with async_session() as primary:
+                task = (await primary.execute(query)).scalar_one_or_none()
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
-        if task.status != TaskStatus.PROCESSING.value:
-            raise HTTPException(status_code=400, detail="Task not in processing state")
+        
+        # Status comes from the DB only, workers keep it current and the lease
+        # reaper resolves tasks whose worker died
+        return task.to_dict(fields)
 
-        task.status = TaskStatus.CANCELLED.value
+    @staticmethod
+    async def cancel_task(db: AsyncSession, task_id: str) -> Dict[str, Any]:
+        """
+        Cancel a pending or processing task
+        
+        The worker is not killed: pending tasks are revoked so workers drop their message,
+        running tasks see the cancel flag at their next check point and free their slot.
+        """
+        result = await db.execute(
+            update(TranslationTask)
+            .where(TranslationTask.task_id == task_id, TranslationTask.status.in_(LIVE_STATUSES))
+            .values(status=TaskStatus.CANCELLED.value, updated_at=datetime.now(timezone.utc))
+            .returning(TranslationTask.task_id)
+        )
+        if result.first() is None:
+            task = (await db.execute(
+                select(TranslationTask.status).filter(TranslationTask.task_id == task_id))).scalar_one_or_none()
+            if task is None:
+                raise HTTPException(status_code=404, detail="Task not found")
+            raise HTTPException(status_code=409, detail=f"Task already {task}")
         await db.commit()
 
-        # Cancel celery task
-        try:
-            celery_app.control.revoke(task_id, terminate=True)
-        except Exception as e:
-            logger.error(f"Failed to cancel celery task {task_id}: {e}")
-            await db.rollback()
-            raise HTTPException(status_code=500, detail="Failed to cancel task")
+        # Set both, the task may be picked up between the update and the revoke
+        await asyncio.to_thread(CancellationService.request, task_id)
+        await asyncio.to_thread(celery_app.control.revoke, task_id)
+        metrics.incr("tasks_cancelled")
+        logger.info(f"Cancelled task {task_id}")
+        return {"task_id": task_id, "status": TaskStatus.CANCELLED.value}
+
+    @staticmethod
+    async def list_tasks(
+        db: AsyncSession,
+        status: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        List tasks newest first using keyset pagination
+        
+        Args:
+            db: Database session
+            status: Optional status filter
+            created_from: Optional inclusive lower bound on created_at
+            created_to: Optional exclusive upper bound on created_at
+            limit: Page size
+            cursor: Opaque cursor returned by the previous page
+            fields: Optional projection, other columns are not fetched
+            
+        Returns:
+            Dictionary with the page items and the cursor of the next page
+        """
+        if status is not None and status not in {s.value for s in TaskStatus}:
+            raise HTTPException(status_code=400, detail=f"Unsupported status: {status}")
+
+        query = select(TranslationTask).options(*TranslationService._load_fields(fields))
+        if status is not None:
+            query = query.filter(TranslationTask.status == status)
+        if created_from is not None:
+            query = query.filter(TranslationTask.created_at >= _to_naive_utc(created_from))
+        if created_to is not None:
+            query = query.filter(TranslationTask.created_at < _to_naive_utc(created_to))
+        if cursor:
+            cursor_created_at, cursor_id = _decode_cursor(cursor)
+            # Seek past the last row of the previous page instead of using OFFSET
+            query = query.filter(
+                tuple_(TranslationTask.created_at, TranslationTask.id) < (cursor_created_at, cursor_id)
+            )
+
+        # Fetch one extra row to know whether there is a next page
+        query = query.order_by(
+            TranslationTask.created_at.desc(), TranslationTask.id.desc()
+        ).limit(limit + 1)
+
+        result = await db.execute(query)
+        tasks = result.scalars().all()
+
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = _encode_cursor(tasks[-1].created_at, tasks[-1].id)
+
+        return {
+            "items": [task.to_dict(fields) for task in tasks],
+            "next_cursor": next_cursor,
+        }
+
+    @staticmethod
+    async def get_tasks_status(db: AsyncSession, task_ids: List[str]) -> Dict[str, Any]:
+        """
+        Get the status of many tasks with a single query
+        
+        Args:
+            db: Database session
+            task_ids: Task ids to resolve
+            
+        Returns:
+            Dictionary with the resolved tasks and the ids that were not found
+        """
+        # Keep request order while dropping duplicates
+        task_ids = list(dict.fromkeys(task_ids))
+
+        def query(ids: List[str]):
+            return (
+                select(TranslationTask)
+                .filter(TranslationTask.task_id.in_(ids))
+                .options(*TranslationService._load_fields(["status", "error_message", "updated_at"]))
+            )
+
+        result = await db.execute(query(task_ids))
+        tasks = {task.task_id: task for task in result.scalars().all()}
+        if is_replica(db):
+            # Only the ids the replica does not have yet, and live tasks that may have moved on
+            # while it lags, go to the primary
+            missing = [task_id for task_id in task_ids if task_id not in tasks]
+            stale = [task_id for task_id, task in tasks.items()
+                     if task.status in LIVE_STATUSES] if replica_lags(db) else []
+            if missing:
+                metrics.incr("db_replica_miss_fallbacks")
+            if stale:
+                metrics.incr("db_replica_stale_fallbacks")
+            if missing or stale:
+                async with async_session() as primary:
+                    result = await primary.execute(query(missing + stale))
+                    tasks.update((task.task_id, task) for task in result.scalars().all())
+
+        return {
+            "tasks": [
+                {
+                    "task_id": task_id,
+                    "status": tasks[task_id].status,
+                    "error_message": tasks[task_id].error_message,
+                    "updated_at": tasks[task_id].updated_at.isoformat() if tasks[task_id].updated_at else None,
+                }
+                for task_id in task_ids if task_id in tasks
+            ],
+            "not_found": [task_id for task_id in task_ids if task_id not in tasks],
+        }
+
+
+def _payload_fingerprint(params: TranslationParams) -> str:
+    """Hash the fields that make two submissions produce the same result"""
+    payload = json.dumps({
+        "audio_url": params.audio_url,
+        "target_languages": sorted(set(params.target_languages)),
+        "original_text": params.original_text,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _to_naive_utc(value: datetime) -> datetime:
+    """Convert a datetime to naive UTC to match the TIMESTAMP WITHOUT TIME ZONE columns"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode_cursor(created_at: datetime, id_value: uuid.UUID) -> str:
+    """Encode the keyset position of a row into an opaque cursor"""
+    payload = json.dumps([created_at.isoformat(), str(id_value)])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
 
-        return {"message": "Task cancelled successfully"}
\ No newline at end of file
+def _decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Decode a cursor produced by _encode_cursor"""
+    try:
+        created_at, id_value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), uuid.UUID(id_value)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,205 @@
+"""
+Trigram inverted index over the data area of a stories.bin file
+
+The index is a sidecar file <base>.tri:
+
+    header (16 bytes): magic "TRI1" | num_records (uint32) | num_trigrams (uint32) | base fingerprint (uint32)
+    dictionary: num_trigrams entries sorted by trigram, each
+        trigram (12 bytes, UTF-8, null padded) | postings offset (uint64) | postings count (uint32)
+    postings: sorted uint32 index record positions of the base file
+
+Trigrams are taken from the lowercased text. num_records and the fingerprint, a CRC32 of the
+header and index area of the base file, tie the index to its base file, an index built for
+another version of the base file is ignored.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional, Set, Tuple
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TRIGRAM_MAGIC = b"TRI1"
+TRIGRAM_HEADER = struct.Struct("<4sIII")
+TRIGRAM_ENTRY = struct.Struct("<12sQI")
+POSTING = struct.Struct("<I")
+
+
+def trigram_index_path(base_path: str) -> str:
+    """Path of the trigram index of a base file"""
+    return f"{base_path}.tri"
+
+
+def normalize(text: str) -> str:
+    """Normalization applied to indexed texts and to queries"""
+    return text.lower()
+
+
+def trigrams(text: str) -> Set[str]:
+    """Distinct trigrams of a normalized text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _encode_trigram(trigram: str) -> bytes:
+    return trigram.encode("utf-8").ljust(12, b"\x00")
+
+
+def write_trigram_index(records: Iterable[Tuple[int, str]], num_records: int, fingerprint: int,
+                        output_file: str) -> int:
+    """
+    Build the trigram index of a base file
+    
+    Args:
+        records: (index record position, text content) of every base record, by position
+        num_records: Number of records of the base file
+        fingerprint: Fingerprint of the base file, see FileDecodingService.fingerprint
+        output_file: Path of the index file
+        
+    Returns:
+        int: Number of distinct trigrams
+    """
+    postings = defaultdict(list)
+    for position, content in records:
+        for trigram in trigrams(normalize(content)):
+            postings[trigram].append(position)
+
+    keys = sorted(postings, key=_encode_trigram)
+    temp_file = f"{output_file}.tmp"
+    with open(temp_file, "wb") as f:
+        f.write(TRIGRAM_HEADER.pack(TRIGRAM_MAGIC, num_records, len(keys), fingerprint))
+        offset = 0
+        for key in keys:
+            f.write(TRIGRAM_ENTRY.pack(_encode_trigram(key), offset, len(postings[key])))
+            offset += len(postings[key]) * POSTING.size
+        for key in keys:
+            values = array("I", postings[key])
+            if sys.byteorder == "big":
+                values.byteswap()
+            f.write(values.tobytes())
+    os.replace(temp_file, output_file)
+    return len(keys)
+
+
+class _Postings:
+    """Sorted posting list read in place from the mapped index, supports len, indexing and bisect"""
+
+    def __init__(self, mm: mmap.mmap, start: int, count: int):
+        self._mm = mm
+        self._start = start
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> int:
+        return POSTING.unpack_from(self._mm, self._start + i * POSTING.size)[0]
+
+    def __contains__(self, position: int) -> bool:
+        i = bisect_left(self, position)
+        return i < self._count and self[i] == position
+
+
+class TrigramIndex:
+    """Memory mapped trigram index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_records, self.num_trigrams, self.fingerprint = TRIGRAM_HEADER.unpack_from(self._mm, 0)
+        if magic != TRIGRAM_MAGIC:
+            self._mm.close()
+            raise ValueError(f"not a trigram index: {path}")
+        self._postings_start = TRIGRAM_HEADER.size + self.num_trigrams * TRIGRAM_ENTRY.size
+
+    @classmethod
+    def open(cls, path: str, num_records: int, fingerprint: int) -> Optional["TrigramIndex"]:
+        """Open the index of a base file, None if it is missing or was built for another version"""
+        if not os.path.exists(path):
+            return None
+        index = cls(path)
+        if index.num_records != num_records:
+            logger.warning(f"ignoring stale trigram index {path}: built for {index.num_records} records, base has {num_records}")
+            index.close()
+            return None
+        if index.fingerprint != fingerprint:
+            logger.warning(f"ignoring stale trigram index {path}: built for another version of the base file")
+            index.close()
+            return None
+        return index
+
+    def close(self) -> None:
+        """Release the file mapping"""
+        self._mm.close()
+
+    def postings(self, trigram: str) -> _Postings:
+        """Posting list of a trigram, empty if it does not occur"""
+        key = _encode_trigram(trigram)
+        low, high = 0, self.num_trigrams
+        while low < high:
+            mid = (low + high) // 2
+            entry_key, offset, count = TRIGRAM_ENTRY.unpack_from(self._mm, TRIGRAM_HEADER.size + mid * TRIGRAM_ENTRY.size)
+            if entry_key < key:
+                low = mid + 1
+            elif entry_key > key:
+                high = mid
+            else:
+                return _Postings(self._mm, self._postings_start + offset, count)
+        return _Postings(self._mm, self._postings_start, 0)
+
+    def candidates(self, query: str, low: int = 0, high: Optional[int] = None) -> List[int]:
+        """
+        Positions of the records containing every trigram of a normalized query
+        
+        Candidates still have to be verified, a record can hold all trigrams without the phrase.
+        The shortest posting list drives the intersection, the others are probed with binary search.
+        
+        Args:
+            query: Normalized query, at least 3 characters
+            low: First position to consider
+            high: Position after the last one to consider
+        """
+        lists = sorted((self.postings(trigram) for trigram in trigrams(query)), key=len)
+        if not lists:
+            return []
+        shortest = lists[0]
+        high = self.num_records if high is None else high
+        start = bisect_left(shortest, low)
+        end = bisect_left(shortest, high)
+        result = [shortest[i] for i in range(start, end)]
+        for postings in lists[1:]:
+            if not result:
+                break
+            result = [position for position in result if position in postings]
+        return result
+
+    def similar_candidates(self, text: str, low: int = 0, high: Optional[int] = None,
+                           sample: int = 32, top: int = 5) -> List[int]:
+        """
+        Positions of the records sharing the most rare trigrams with a normalized text
+        
+        Only the sample trigrams with the shortest posting lists are counted, rare trigrams
+        identify a text far better than common ones and keep the work independent of its length.
+        
+        Args:
+            text: Normalized text
+            low: First position to consider
+            high: Position after the last one to consider
+            sample: Number of rarest trigrams to count
+            top: Number of candidates to return
+        """
+        high = self.num_records if high is None else high
+        lists = sorted((self.postings(trigram) for trigram in trigrams(text)), key=len)
+        lists = [postings for postings in lists if len(postings)][:sample]
+        counts = Counter()
+        for postings in lists:
+            for i in range(bisect_left(postings, low), bisect_left(postings, high)):
+                counts[postings[i]] += 1
+        return [position for position, _ in counts.most_common(top)]
@@ -0,0 +1,313 @@
+"""
+Async I/O worker for the translation queue
+
+Consumes stt_task messages from translation_task_queue like a Celery worker does, but runs
+download, translation and DB updates on an asyncio event loop so one process keeps hundreds
+of tasks in flight. Transcription is CPU bound and runs in a separate process pool.
+
+Run with: python -m src.tasks.async_worker
+"""
+
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+import httpx
+from kombu import Consumer
+
+from src.celery_app import celery_app
+from src.configs.config import settings
+from src.services.audio_preprocessing_service import AudioDecodeError, AudioPreprocessingService
+from src.services.cancellation_service import CancellationService, TaskCancelled
+from src.services.llm_translate_service import LLMTranslateService
+from src.services.stt_service import transcribe
+from src.services.task_state_repository import TRANSIENT_DB_ERRORS, AsyncTaskStateRepository
+from src.services.translation_pipeline import (
+    RETRY_POLICIES, STAGE_DECODE, STAGE_DOWNLOAD, STAGE_TRANSCRIBE, STAGE_TRANSLATE, TranslationPipeline)
+from src.tasks.translation_tasks import stt_task
+from src.utils import metrics
+from src.utils.file import adownload_url_to_temp_file, cleanup_temp_file
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+QUEUE_NAME = 'translation_task_queue'
+# Seconds between batched progress writes
+PROGRESS_FLUSH_INTERVAL = 2.0
+
+
+class _RetryLater(Exception):
+    """The task saved its checkpoint and is republished after countdown seconds"""
+
+    def __init__(self, exc: Exception, countdown: float):
+        super().__init__(str(exc))
+        self.exc = exc
+        self.countdown = countdown
+
+
+class AsyncWorker:
+    """Translation worker running network bound stages on an event loop"""
+
+    def __init__(self, concurrency: int = settings.async_worker_concurrency,
+                 stt_processes: int = settings.async_worker_stt_processes):
+        self.concurrency = concurrency
+        self.stt_processes = stt_processes
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stt_pool: Optional[ProcessPoolExecutor] = None
+        self.http: Optional[httpx.AsyncClient] = None
+        self.repository = AsyncTaskStateRepository()
+        # Messages are acked on the consumer thread, kombu channels are not thread safe
+        self._acks: "queue.Queue" = queue.Queue()
+        self._stopping = threading.Event()
+        self._in_flight = 0
+        # Translation tasks whose lease this process holds
+        self._leased: Set[str] = set()
+        # Decoded PCM is held from decode until the STT pool took it, one clip transcribing and
+        # one waiting per STT process bounds that memory instead of the task concurrency
+        self._decoded_slots: Optional[asyncio.Semaphore] = None
+
+    def run(self) -> None:
+        """Start consuming until SIGINT / SIGTERM"""
+        # Spawned processes do not inherit the event loop, the consumer thread or open connections
+        self.stt_pool = ProcessPoolExecutor(
+            max_workers=self.stt_processes, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            asyncio.run(self._main())
+        finally:
+            self.stt_pool.shutdown(wait=True)
+
+    async def _main(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._decoded_slots = asyncio.Semaphore(2 * self.stt_processes)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self._stopping.set)
+
+        self.http = httpx.AsyncClient(
+            timeout=30, limits=httpx.Limits(max_connections=self.concurrency))
+        consumer = threading.Thread(target=self._consume, name="async-worker-consumer", daemon=True)
+        consumer.start()
+        flusher = asyncio.create_task(self._flush_progress())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        logger.info(f"Async worker consuming {QUEUE_NAME} with concurrency {self.concurrency}")
+        try:
+            while consumer.is_alive():
+                await asyncio.sleep(1)
+        finally:
+            self._stopping.set()
+            flusher.cancel()
+            heartbeat.cancel()
+            await self.http.aclose()
+
+    def _consume(self) -> None:
+        """Pull messages from the broker and hand them to the event loop"""
+        task_queue = celery_app.amqp.queues[QUEUE_NAME]
+        with celery_app.connection_for_read() as connection:
+            with Consumer(connection, queues=[task_queue], callbacks=[self._on_message],
+                          accept=['json']) as consumer:
+                # Prefetch bounds the number of tasks in flight
+                consumer.qos(prefetch_count=self.concurrency)
+                while not self._stopping.is_set():
+                    self._drain_acks()
+                    try:
+                        connection.drain_events(timeout=1)
+                    except TimeoutError:
+                        pass
+                # Let running tasks finish before closing the channel
+                while self._in_flight:
+                    self._drain_acks(timeout=1)
+                self._drain_acks()
+
+    def _drain_acks(self, timeout: Optional[float] = None) -> None:
+        try:
+            message = self._acks.get(timeout=timeout) if timeout else self._acks.get_nowait()
+            while True:
+                message.ack()
+                self._in_flight -= 1
+                message = self._acks.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _on_message(self, body: Any, message) -> None:
+        headers = message.headers or {}
+        if headers.get('task') != stt_task.name:
+            logger.error(f"Rejecting unknown task {headers.get('task')}")
+            message.reject()
+            return
+
+        args, kwargs, _ = body
+        task_id = kwargs.get('task_id', args[0] if args else None)
+        countdown = 0.0
+        if headers.get('eta'):
+            eta = datetime.fromisoformat(headers['eta'])
+            if eta.tzinfo is None:
+                eta = eta.replace(tzinfo=timezone.utc)
+            countdown = max(0.0, (eta - datetime.now(timezone.utc)).total_seconds())
+
+        self._in_flight += 1
+        future = asyncio.run_coroutine_threadsafe(
+            self._handle(headers['id'], task_id, headers.get('retries', 0), countdown), self.loop)
+        future.add_done_callback(lambda _: self._acks.put(message))
+
+    async def _handle(self, celery_task_id: str, task_id: str, retries: int, countdown: float) -> None:
+        # The task row is the only state, stt_task ignores results and so does this worker
+        if countdown:
+            await asyncio.sleep(countdown)
+        try:
+            await self.process_task(task_id, retries)
+        except _RetryLater as e:
+            await asyncio.to_thread(
+                stt_task.apply_async, args=[task_id], task_id=celery_task_id,
+                countdown=e.countdown, retries=retries + 1)
+        except Exception:
+            # Stage errors are already written to the task row by process_task
+            logger.exception(f"STT task {task_id} failed")
+        finally:
+            self._leased.discard(task_id)
+            await asyncio.to_thread(metrics.flush_to_redis)
+
+    async def process_task(self, task_id: str, retries: int = 0) -> Dict[str, Any]:
+        """Async counterpart of stt_task, resumes from the checkpoint of earlier attempts"""
+        logger.info(f"Processing STT task for {task_id}")
+        metrics.incr("tasks_processed")
+
+        # Move the task to processing, cancelled and finished tasks are left alone
+        try:
+            task = await self.repository.start(task_id)
+        except TRANSIENT_DB_ERRORS as e:
+            # The row is still pending and nothing else picks it up, republished until the database is back
+            countdown = RETRY_POLICIES[STAGE_DOWNLOAD].delay(retries)
+            logger.warning(f"Failed to start {task_id}, retrying in {countdown:.1f}s: {e}")
+            raise _RetryLater(e, countdown)
+        if not task:
+            error_msg = f"Task not found or not runnable: {task_id}"
+            logger.error(error_msg)
+            return {"error": error_msg}
+        self._leased.add(task_id)
+        logger.info(f"Updated task {task_id} status to PROCESSING")
+
+        checkpoint = dict(task.checkpoint or {})
+        stt_result = task.stt_result
+        multi_translate_result = dict(task.translation_results or {})
+        temp_file_path = checkpoint.get("audio_file")
+        stage = STAGE_DOWNLOAD
+        try:
+            if stt_result is None:
+                preprocessing = None
+                # Temp files stay on disk while waiting, only decoded audio takes a slot
+                async with self._decoded_slots if settings.audio_preprocessing else contextlib.nullcontext():
+                    if settings.audio_preprocessing:
+                        # ffmpeg decodes while the body streams in, trimming runs in a thread
+                        audio, preprocessing = await AudioPreprocessingService.aload_url(task.audio_url, self.http)
+                    elif temp_file_path and os.path.exists(temp_file_path):
+                        audio = temp_file_path
+                    else:
+                        temp_file_path = await adownload_url_to_temp_file(task.audio_url, client=self.http)
+                        checkpoint["audio_file"] = temp_file_path
+                        # Only useful on this host, written with the next checkpoint
+                        self.repository.record_progress(task_id, checkpoint=checkpoint)
+                        audio = temp_file_path
+
+                    stage = STAGE_TRANSCRIBE
+                    # Checked in the pool process between decoded windows
+                    result = await self.loop.run_in_executor(
+                        self.stt_pool, transcribe, audio, CancellationService.checker(task_id))
+                    # The parent's copy is not needed once transcribed
+                    del audio
+                stt_result = TranslationPipeline.build_stt_result(result, preprocessing)
+
+                error_msg = TranslationPipeline.check_accuracy(task.original_text, result["text"])
+                if error_msg:
+                    await self.repository.fail(task_id, error_msg)
+                    logger.error(f"STT task failed for {task_id}: {result['text']}")
+                    return {"error": error_msg}
+
+                # Translation memory reads the stories files, keep it off the loop
+                local_translations, _ = await asyncio.to_thread(
+                    TranslationPipeline.plan_translations, stt_result, task.target_languages)
+                multi_translate_result.update(local_translations)
+
+                checkpoint.pop("audio_file", None)
+                if not await self.repository.save_checkpoint(
+                        task_id, stt_result=stt_result, translation_results=multi_translate_result,
+                        checkpoint=checkpoint):
+                    return {"error": f"Task is no longer processing: {task_id}"}
+                cleanup_temp_file(temp_file_path)
+                temp_file_path = None
+            else:
+                logger.info(f"Resuming {task_id} from its transcript")
+
+            stage = STAGE_TRANSLATE
+            llm_languages = [
+                language for language in task.target_languages if language not in multi_translate_result]
+            if llm_languages:
+                await asyncio.to_thread(CancellationService.check, task_id)
+                multi_translate_result.update(await LLMTranslateService().atranslate(
+                    stt_result["text"], llm_languages))
+            else:
+                logger.info(f"All target languages of {task_id} served without LLM")
+
+            if not await self.repository.complete(task_id, translation_results=multi_translate_result):
+                logger.warning(f"Task {task_id} left processing while running, results discarded")
+                return {"error": f"Task is no longer processing: {task_id}"}
+            logger.info(f"STT task completed for {task_id}")
+            return {"text": stt_result["text"]}
+
+        except TaskCancelled:
+            logger.info(f"Stopped cancelled task {task_id} in {stage}")
+            await asyncio.to_thread(CancellationService.record_slot_freed, task_id)
+            return {"cancelled": True}
+
+        except Exception as e:
+            if isinstance(e, AudioDecodeError):
+                stage = STAGE_DECODE
+            error_msg = f"STT task failed in {stage}: {str(e)}"
+            logger.error(f"Error processing STT task {task_id}: {error_msg}")
+            countdown = TranslationPipeline.next_retry(checkpoint, stage)
+            try:
+                if countdown is None:
+                    await self.repository.fail(task_id, error_msg)
+                elif await self.repository.release_for_retry(
+                        task_id, countdown, checkpoint=checkpoint, error_message=error_msg):
+                    logger.info(f"Retrying {task_id} from {stage} in {countdown:.1f}s")
+                    temp_file_path = None
+                    raise _RetryLater(e, countdown)
+            except _RetryLater:
+                raise
+            except Exception as db_error:
+                logger.error(f"Failed to update task status: {db_error}")
+            raise
+        finally:
+            if temp_file_path:
+                cleanup_temp_file(temp_file_path)
+
+    async def _flush_progress(self) -> None:
+        """Write buffered progress of all tasks in flight in one batch"""
+        while True:
+            await asyncio.sleep(PROGRESS_FLUSH_INTERVAL)
+            try:
+                await self.repository.flush_progress()
+            except Exception as e:
+                logger.warning(f"Failed to flush task progress: {e}")
+
+    async def _heartbeat(self) -> None:
+        """Extend the leases of all tasks in flight in one statement"""
+        while True:
+            await asyncio.sleep(settings.task_heartbeat_interval)
+            if not self._leased:
+                continue
+            try:
+                await self.repository.heartbeat(list(self._leased))
+                metrics.incr("lease_heartbeats")
+            except Exception as e:
+                logger.warning(f"Failed to extend task leases: {e}")
+
+
+if __name__ == "__main__":
+    AsyncWorker().run()
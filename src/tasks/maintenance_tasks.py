@@ -0,0 +1,69 @@
+"""
+Database maintenance tasks for Celery
+"""
+
+from typing import Dict, Any
+from celery import shared_task
+
+from src.configs.config import settings
+from src.utils.logger import get_logger
+from src.models.base import get_sync_db
+from src.services.lease_service import LeaseReaper
+from src.services.partition_service import PartitionService
+from src.tasks.translation_tasks import stt_task
+
+logger = get_logger(__name__)
+
+
+@shared_task(name='src.tasks.maintenance_tasks.maintain_partitions_task', queue='default')
+def maintain_partitions_task() -> Dict[str, Any]:
+    """
+    Create upcoming translation_tasks partitions and drop the expired ones,
+    exporting them first when an archive directory is configured.
+    Deduplication ledger entries older than the retention window are purged too.
+    """
+    db = get_sync_db()
+    try:
+        created = PartitionService.ensure_partitions(db, settings.partition_premake_months)
+        expired = PartitionService.expired_partitions(db, settings.partition_retention_months)
+        purged = PartitionService.purge_expired_submissions(db, settings.partition_retention_months)
+    finally:
+        db.close()
+
+    archived = []
+    dropped = []
+    for name in expired:
+        if settings.partition_archive_dir:
+            archived.append(PartitionService.archive_partition(name, settings.partition_archive_dir))
+        PartitionService.drop_partition(name)
+        dropped.append(name)
+
+    logger.info(f"partition maintenance done: ensured={created}, dropped={dropped}, purged submissions={purged}")
+    return {"ensured": created, "archived": archived, "dropped": dropped, "purged_submissions": purged}
+
+
+@shared_task(name='src.tasks.maintenance_tasks.reap_expired_leases_task', queue='default')
+def reap_expired_leases_task() -> Dict[str, Any]:
+    """
+    Re-queue processing tasks whose worker died, fail the ones that lost too many workers
+    """
+    db = get_sync_db()
+    try:
+        requeued, failed = LeaseReaper.reap_expired(db)
+    finally:
+        db.close()
+
+    # Published after the commit, the worker takes the lease the reaper released
+    published, unpublished = [], []
+    for task_id in requeued:
+        try:
+            stt_task.apply_async(args=[task_id], task_id=task_id)
+            published.append(task_id)
+        except Exception as e:
+            # The released lease expires again and a later run re-queues the task
+            logger.error(f"Failed to publish re-queued task {task_id}: {e}")
+            unpublished.append(task_id)
+
+    if requeued or failed:
+        logger.info(f"lease reaper done: requeued={published}, unpublished={unpublished}, failed={failed}")
+    return {"requeued": published, "unpublished": unpublished, "failed": failed}
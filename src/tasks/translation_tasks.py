@@ -2,113 +2,182 @@
 Speech-to-Text (STT) tasks for Celery
 """
 
-import whisper
+import os
 from typing import Dict, Any
-from datetime import datetime, timezone
 from celery import shared_task
+from celery.exceptions import Retry
 
-from src.services.llm_translate_service import LLMTranslateService
-from src.services.similarity_service import SimilarityService
 from src.configs.config import settings
+from src.services.audio_preprocessing_service import AudioDecodeError, AudioPreprocessingService
+from src.services.cancellation_service import CancellationService, TaskCancelled
+from src.services.lease_service import LeaseKeeper
+from src.services.llm_translate_service import LLMTranslateService
+from src.services.translation_pipeline import (
+    RETRY_POLICIES, STAGE_DECODE, STAGE_DOWNLOAD, STAGE_TRANSCRIBE, STAGE_TRANSLATE, TranslationPipeline)
+from src.services.speculative_translation_service import SpeculativeTranslator
+from src.services.stt_service import transcribe
 from src.utils.logger import get_logger
-from src.models.base import get_sync_db
-from src.models.translation_model import TranslationTask, TaskStatus
+from src.services.task_state_repository import TRANSIENT_DB_ERRORS, TaskStateRepository
 from src.utils.file import cleanup_temp_file, download_url_to_temp_file
+from src.utils import metrics
 
 logger = get_logger(__name__)
 
 
+# The task row is the only state the API reads, results in the backend would go unread
 @shared_task(bind=True, name='src.tasks.translation_tasks.stt_task', queue='translation_task_queue',
-             autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 60})
+             ignore_result=True)
 def stt_task(self, task_id: str) -> Dict[str, Any]:
     logger.info(f"Processing STT task for {task_id}")
+    metrics.incr("tasks_processed")
 
-    db = get_sync_db()
+    repository = TaskStateRepository()
+    # Move the task to processing, cancelled and finished tasks are left alone
     try:
-        # Get task from database
-        task = db.query(TranslationTask).filter(
-            TranslationTask.task_id == task_id).first()
-        if not task:
-            error_msg = f"Task not found: {task_id}"
-            logger.error(error_msg)
-            return {"error": error_msg}
-
-        # Update task status to processing
-        task.status = TaskStatus.PROCESSING.value
-        task.updated_at = datetime.now(timezone.utc)
-        db.commit()
-        logger.info(f"Updated task {task_id} status to PROCESSING")
-
-        # Load Whisper model and process audio
-        temp_file_path = download_url_to_temp_file(task.audio_url)
-
-        model = whisper.load_model(settings.whisper_model)
-        result = model.transcribe(temp_file_path)
-
-        # Prepare STT result
-        stt_result = {
-            "text": result["text"],
-            "language": result["language"],
-            "processed_at": datetime.now(timezone.utc).isoformat()
-        }
-        # Check if the STT result is accurate
-        original_text = task.original_text
-        if original_text:
-            # Calculate the similarity between the original text and the STT result
-            similarity = SimilarityService.calculate_similarity(
-                original_text, result["text"])
-            if similarity < 0.8:
-                error_msg = f"STT result is not accurate, similarity: {similarity}"
-                task.status = TaskStatus.FAILED.value
-                task.error_message = error_msg
-                task.updated_at = datetime.now(timezone.utc)
-                db.commit()
+        task = repository.start(task_id)
+    except TRANSIENT_DB_ERRORS as e:
+        # The row is still pending and nothing else picks it up, retry until the database is back
+        countdown = RETRY_POLICIES[STAGE_DOWNLOAD].delay(self.request.retries)
+        logger.warning(f"Failed to start {task_id}, retrying in {countdown:.1f}s: {e}")
+        raise self.retry(exc=e, countdown=countdown, max_retries=None)
+    if not task:
+        error_msg = f"Task not found or not runnable: {task_id}"
+        logger.error(error_msg)
+        return {"error": error_msg}
+    LeaseKeeper.hold(task_id)
+    logger.info(f"Updated task {task_id} status to PROCESSING")
+
+    # Outputs of the stages finished by earlier attempts
+    checkpoint = dict(task.checkpoint or {})
+    stt_result = task.stt_result
+    multi_translate_result = dict(task.translation_results or {})
+    temp_file_path = checkpoint.get("audio_file")
+    stage = STAGE_DOWNLOAD
+    speculative = None
+    try:
+        if stt_result is None:
+            # Download and transcribe audio with the configured STT backend
+            preprocessing = None
+            if settings.audio_preprocessing:
+                # Decoded and trimmed in memory, nothing to checkpoint
+                audio, preprocessing = AudioPreprocessingService.load_url(task.audio_url)
+            elif temp_file_path and os.path.exists(temp_file_path):
+                logger.info(f"Resuming {task_id} with downloaded audio {temp_file_path}")
+                audio = temp_file_path
+            else:
+                temp_file_path = download_url_to_temp_file(task.audio_url)
+                checkpoint["audio_file"] = temp_file_path
+                # Only useful on this host, written with the next checkpoint
+                repository.record_progress(task_id, checkpoint=checkpoint)
+                audio = temp_file_path
+
+            stage = STAGE_TRANSCRIBE
+            if settings.speculative_translation:
+                # Sentences are translated while later audio is still decoded
+                speculative = SpeculativeTranslator(task_id, task.target_languages)
+            result = transcribe(audio, CancellationService.checker(task_id),
+                                on_segment=speculative.feed if speculative else None)
+
+            # Prepare STT result
+            stt_result = TranslationPipeline.build_stt_result(result, preprocessing)
+
+            # Check if the STT result is accurate
+            error_msg = TranslationPipeline.check_accuracy(task.original_text, result["text"])
+            if error_msg:
+                repository.fail(task_id, error_msg)
                 logger.error(f"STT task failed for {task_id}: {result['text']}")
                 return {"error": error_msg}
 
+            # Languages served without the LLM
+            local_translations, llm_languages = TranslationPipeline.plan_translations(
+                stt_result, task.target_languages)
+            multi_translate_result.update(local_translations)
+
+            if speculative and llm_languages:
+                stage = STAGE_TRANSLATE
+                try:
+                    multi_translate_result.update(speculative.finish(llm_languages))
+                    stt_result["speculative_translation"] = True
+                except TaskCancelled:
+                    raise
+                except Exception as e:
+                    # The full text is translated in the translation stage instead
+                    logger.warning(f"Speculative translation of {task_id} failed: {e}")
+
+            # The transcript replaces the audio from here on
+            checkpoint.pop("audio_file", None)
+            if not repository.save_checkpoint(task_id, stt_result=stt_result,
+                                              translation_results=multi_translate_result, checkpoint=checkpoint):
+                return {"error": f"Task is no longer processing: {task_id}"}
+            cleanup_temp_file(temp_file_path)
+            temp_file_path = None
+        else:
+            logger.info(f"Resuming {task_id} from its transcript")
+
         # Translate the text
-        service = LLMTranslateService()
-        multi_translate_result = service.translate(
-            result["text"], task.target_languages)
+        stage = STAGE_TRANSLATE
+        llm_languages = [
+            language for language in task.target_languages if language not in multi_translate_result]
+        if llm_languages:
+            CancellationService.check(task_id)
+            service = LLMTranslateService()
+            multi_translate_result.update(service.translate(
+                stt_result["text"], llm_languages))
+        else:
+            logger.info(f"All target languages of {task_id} served without LLM")
 
         # Update task with STT results
-        task.stt_result = stt_result
-        task.translation_results = multi_translate_result
-        task.status = TaskStatus.COMPLETED.value
-        task.updated_at = datetime.now(timezone.utc)
-        db.commit()
+        if not repository.complete(task_id, translation_results=multi_translate_result):
+            logger.warning(f"Task {task_id} left processing while running, results discarded")
+            return {"error": f"Task is no longer processing: {task_id}"}
 
-        logger.info(f"STT task completed for {task_id}: {result['text']}")
-        logger.info(f"Detected language: {result['language']}")
+        logger.info(f"STT task completed for {task_id}: {stt_result['text']}")
+        logger.info(f"Detected language: {stt_result['language']}")
 
         return {
             "message": "STT task processed successfully",
             "task_id": task_id,
-            "text": result["text"],
-            "language": result["language"]
+            "text": stt_result["text"],
+            "language": stt_result["language"]
         }
 
+    except TaskCancelled:
+        # The API already marked the task cancelled, only the slot has to be freed
+        logger.info(f"Stopped cancelled task {task_id} in {stage}")
+        cleanup_temp_file(temp_file_path)
+        temp_file_path = None
+        CancellationService.record_slot_freed(task_id)
+        return {"cancelled": True, "task_id": task_id}
+
     except Exception as e:
-        db.rollback()
-        error_msg = f"STT processing error for {task_id}: {str(e)}"
+        if isinstance(e, AudioDecodeError):
+            stage = STAGE_DECODE
+        error_msg = f"STT processing error for {task_id} in {stage}: {str(e)}"
         logger.error(error_msg)
 
-        # Update task status to failed
+        countdown = TranslationPipeline.next_retry(checkpoint, stage)
         try:
-            task = db.query(TranslationTask).filter(
-                TranslationTask.task_id == task_id).first()
-            if task:
-                task.status = TaskStatus.FAILED.value
-                task.error_message = error_msg
-                task.updated_at = datetime.now(timezone.utc)
-                db.commit()
+            if countdown is not None:
+                # Keep the task processing with its checkpoint, the retry picks it up
+                if repository.release_for_retry(task_id, countdown, checkpoint=checkpoint,
+                                                error_message=error_msg):
+                    logger.info(f"Retrying {task_id} from {stage} in {countdown:.1f}s")
+                    temp_file_path = None
+                    raise self.retry(exc=e, countdown=countdown, max_retries=None)
+            else:
+                # Update task status to failed
+                repository.fail(task_id, error_msg)
+        except Retry:
+            raise
         except Exception as db_error:
             logger.error(
                 f"Failed to update error status for task {task_id}: {str(db_error)}")
-
-        # Re-raise for Celery retry mechanism
         raise
 
     finally:
-        db.close()
-        cleanup_temp_file(temp_file_path)
+        LeaseKeeper.release(task_id)
+        # Speculative translations not used by now are thrown away
+        if speculative:
+            speculative.discard()
+        if temp_file_path:
+            cleanup_temp_file(temp_file_path)
@@ -2,6 +2,7 @@
 File utilities for the Multi Translate Service
 """
 import requests
+import httpx
 import tempfile
 import os
 from typing import Optional
@@ -61,6 +62,54 @@ def download_url_to_temp_file(url: str, suffix: Optional[str] = None) -> str:
         raise IOError(f"Failed to write downloaded file: {str(e)}")
 
 
+async def adownload_url_to_temp_file(url: str, suffix: Optional[str] = None,
+                                     client: Optional[httpx.AsyncClient] = None) -> str:
+    """
+    Download a file from URL to a temporary file without blocking the event loop.
+    
+    Args:
+        url: The URL to download from
+        suffix: Optional file suffix/extension for the temp file
+        client: Optional shared client, reuses its connection pool
+        
+    Returns:
+        str: Path to the temporary file
+        
+    Raises:
+        httpx.HTTPError: If download fails
+        IOError: If file writing fails
+    """
+    if suffix is None:
+        filename = os.path.basename(urlparse(url).path)
+        if '.' in filename:
+            suffix = '.' + filename.split('.')[-1]
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    temp_file_path = temp_file.name
+    temp_file.close()
+
+    owns_client = client is None
+    if owns_client:
+        client = httpx.AsyncClient(timeout=30)
+    try:
+        async with client.stream("GET", url, follow_redirects=True) as response:
+            response.raise_for_status()
+            # Chunks are small, local writes do not stall the loop noticeably
+            with open(temp_file_path, 'wb') as f:
+                async for chunk in response.aiter_bytes(chunk_size=65536):
+                    f.write(chunk)
+        return temp_file_path
+    except httpx.HTTPError as e:
+        cleanup_temp_file(temp_file_path)
+        raise httpx.HTTPError(f"Failed to download file from URL: {str(e)}")
+    except IOError as e:
+        cleanup_temp_file(temp_file_path)
+        raise IOError(f"Failed to write downloaded file: {str(e)}")
+    finally:
+        if owns_client:
+            await client.aclose()
+
+
 def cleanup_temp_file(file_path: str) -> None:
     """
     Clean up temporary file.
@@ -0,0 +1,61 @@
+"""
+Process level counters for the Multi Translate Service
+
+Worker processes push their counters to a Redis hash after every task so the
+API can report worker metrics aggregated across processes.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+from src.utils.logger import get_logger
+from src.utils.redis_client import get_redis
+
+logger = get_logger(__name__)
+
+WORKER_METRICS_KEY = "metrics:worker"
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+# Counter increments not yet pushed to Redis
+_pending: Dict[str, float] = defaultdict(float)
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Increment a counter of this process"""
+    with _lock:
+        _counters[name] += value
+        _pending[name] += value
+
+
+def snapshot() -> Dict[str, float]:
+    """Get the counters of this process"""
+    with _lock:
+        return dict(_counters)
+
+
+def flush_to_redis() -> None:
+    """Add the increments since the last flush to the shared worker counters"""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for name, value in pending.items():
+            pipe.hincrbyfloat(WORKER_METRICS_KEY, name, value)
+        pipe.execute()
+    except Exception as e:
+        # Keep the increments for the next flush
+        with _lock:
+            for name, value in pending.items():
+                _pending[name] += value
+        logger.warning(f"failed to flush metrics to redis: {e}")
+
+
+def worker_snapshot() -> Dict[str, float]:
+    """Get the counters aggregated across all worker processes"""
+    values = get_redis().hgetall(WORKER_METRICS_KEY)
+    return {name.decode("utf-8"): float(value) for name, value in values.items()}
@@ -0,0 +1,142 @@
+"""
+Opt-in sampling profiler for API requests and worker tasks
+
+A sampled share of requests / tasks is profiled with pyinstrument. With a latency
+threshold set, every request / task is profiled and the slow ones are kept too.
+Profiles are written as HTML to a directory holding at most profiling_max_files files,
+the oldest are removed first.
+"""
+
+import os
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.configs.config import settings
+from src.utils.logger import get_logger
+
+try:
+    import pyinstrument
+except ImportError:  # optional, install the profiling extra to enable
+    pyinstrument = None
+
+logger = get_logger(__name__)
+
+_UNSAFE_TAG = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def profiling_enabled() -> bool:
+    """Whether profiling is switched on and pyinstrument is available"""
+    if not settings.profiling_enabled:
+        return False
+    if pyinstrument is None:
+        logger.warning("PROFILING_ENABLED is set but pyinstrument is not installed")
+        return False
+    return True
+
+
+def start_profile(async_mode: str = "disabled") -> Tuple[Optional["pyinstrument.Profiler"], bool]:
+    """
+    Start profiling the current request / task if it is sampled or may turn out slow
+
+    Returns:
+        Tuple of the running profiler (None if not profiled) and whether it was sampled
+    """
+    sampled = random.random() < settings.profiling_sample_rate
+    if not sampled and settings.profiling_latency_threshold_ms <= 0:
+        return None, False
+    profiler = pyinstrument.Profiler(interval=settings.profiling_interval, async_mode=async_mode)
+    profiler.start()
+    return profiler, sampled
+
+
+def finish_profile(profiler: "pyinstrument.Profiler", sampled: bool, kind: str, tag: str) -> Optional[Path]:
+    """
+    Stop the profiler and keep the profile if it was sampled or over the latency threshold
+
+    Args:
+        profiler: Profiler returned by start_profile
+        sampled: Whether the request / task was sampled
+        kind: "request" or "task"
+        tag: Route or task_id, part of the file name
+
+    Returns:
+        Path of the written profile, None if it was dropped
+    """
+    session = profiler.stop()
+    duration_ms = session.duration * 1000
+    threshold = settings.profiling_latency_threshold_ms
+    if not sampled and not (threshold > 0 and duration_ms >= threshold):
+        return None
+
+    directory = Path(settings.profiling_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    safe_tag = _UNSAFE_TAG.sub("_", tag).strip("_")[:80] or "unknown"
+    stamp = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = directory / f"{kind}-{stamp}-{safe_tag}-{int(duration_ms)}ms.html"
+    path.write_text(profiler.output_html(), encoding="utf-8")
+    _rotate(directory)
+    logger.info(f"Wrote profile of {kind} {tag} ({duration_ms:.0f}ms) to {path}")
+    return path
+
+
+def _rotate(directory: Path) -> None:
+    """Remove the oldest profiles beyond profiling_max_files"""
+    profiles = sorted(directory.glob("*.html"), key=lambda path: path.stat().st_mtime)
+    for path in profiles[:max(0, len(profiles) - settings.profiling_max_files)]:
+        try:
+            os.unlink(path)
+        except OSError:
+            # Removed by another process
+            pass
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled and slow HTTP requests, tagged with their route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profiler, sampled = start_profile(async_mode="enabled")
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router stores the matched route, its path template keeps tags low cardinality
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            try:
+                finish_profile(profiler, sampled, "request", f"{scope['method']} {route}")
+            except Exception as e:
+                logger.warning(f"Failed to write request profile: {e}")
+
+
+# Profilers of running tasks, keyed by Celery task id
+_task_profilers: Dict[str, Tuple["pyinstrument.Profiler", bool]] = {}
+
+
+def start_task_profile(task_id: str) -> None:
+    """task_prerun hook"""
+    profiler, sampled = start_profile()
+    if profiler is not None:
+        _task_profilers[task_id] = (profiler, sampled)
+
+
+def finish_task_profile(task_id: str, task_name: str, args) -> None:
+    """task_postrun hook, tagged with the translation task_id when the task has one"""
+    entry = _task_profilers.pop(task_id, None)
+    if entry is None:
+        return
+    tag = f"{task_name.rsplit('.', 1)[-1]}-{args[0] if args else task_id}"
+    try:
+        finish_profile(*entry, "task", tag)
+    except Exception as e:
+        logger.warning(f"Failed to write task profile: {e}")
@@ -0,0 +1,15 @@
+"""
+Redis client for the Multi Translate Service
+"""
+
+from functools import lru_cache
+
+import redis
+
+from src.configs.config import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> redis.Redis:
+    """Get the process level Redis client, connections are pooled by the client"""
+    return redis.Redis.from_url(settings.redis_url)
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from generate_file import append_delta_records, generate_binary_file, generate_trigram_index
+from src.services.file_decoding_service import FileDecodingService
+from src.services.trigram_index import trigram_index_path
+
+TEXTS = [
+    ("en", "1", "TEXT", "the quick brown fox jumps over the lazy dog"),
+    ("en", "2", "TEXT", "a slow green turtle crawls under the bridge"),
+    ("en", "3", "TEXT", "rain falls softly on the quiet harbour"),
+    ("fr", "1", "TEXT", "le renard brun saute par-dessus le chien"),
+]
+
+
+@pytest.fixture
+def base_file(tmp_path):
+    path = str(tmp_path / "stories.bin")
+    generate_binary_file(TEXTS, path)
+    generate_trigram_index(path)
+    return path
+
+
+def _find_similar(path, text, language, top=5):
+    reader = FileDecodingService(path)
+    try:
+        return reader.find_similar(text, language, top)
+    finally:
+        reader.close()
+
+
+def test_find_similar_base(base_file):
+    results = _find_similar(base_file, "the quick brown fox", "en")
+    assert results[0]["text_id"] == "1"
+    assert all(record["language"] == "en" for record in results)
+
+
+def test_find_similar_delta_texts(base_file):
+    append_delta_records(base_file, texts=[("en", "4", "TEXT", "a purple elephant dances at midnight")])
+    results = _find_similar(base_file, "purple elephant dancing", "en")
+    # The best delta text is interleaved right after the best base candidate
+    assert results[1] == {"language": "en", "text_id": "4", "source": "TEXT",
+                          "content": "a purple elephant dances at midnight"}
+
+
+def test_find_similar_skips_unrelated_delta_texts(base_file):
+    append_delta_records(base_file, texts=[("en", "4", "TEXT", "zzzz")])
+    results = _find_similar(base_file, "the quick brown fox", "en")
+    assert "4" not in [record["text_id"] for record in results]
+
+
+def test_find_similar_delta_overrides_and_deletes(base_file):
+    append_delta_records(base_file, texts=[("en", "1", "TEXT", "the quick brown fox sleeps")],
+                         deletes=[("en", "2")])
+    results = _find_similar(base_file, "the quick brown fox", "en", top=10)
+    by_id = {record["text_id"]: record for record in results}
+    assert by_id["1"]["content"] == "the quick brown fox sleeps"
+    assert "2" not in by_id
+    assert len(results) == len(by_id)
+
+
+def test_find_similar_without_index_only_matches_delta(base_file):
+    os.unlink(trigram_index_path(base_file))
+    append_delta_records(base_file, texts=[("en", "4", "TEXT", "the quick brown fox sleeps")])
+    assert [record["text_id"] for record in _find_similar(base_file, "the quick brown fox", "en")] == ["4"]